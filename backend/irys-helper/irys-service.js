@@ -10,6 +10,8 @@ app.use(express.json());
 // Initialize Irys client
 let irys = null;
 
+const MAX_BATCH_ITEMS = parseInt(process.env.MAX_BATCH_ITEMS || '100', 10);
+
 const initializeIrys = async () => {
   try {
     const privateKey = process.env.PRIVATE_KEY;
@@ -40,10 +42,63 @@ const initializeIrys = async () => {
   }
 };
 
+// Upload a single username registration to Irys.
+// Callers that retry pass the original timestamp and a 32-character anchor, so the retry
+// produces the same signed data item and the bundler sees it as a duplicate.
+const uploadUsername = async ({ username, owner, metadata, timestamp, anchor }) => {
+  const registeredAt = timestamp || Date.now();
+
+  // Prepare username data
+  const usernameData = {
+    username: username.toLowerCase(),
+    owner: owner.toLowerCase(),
+    timestamp: registeredAt,
+    metadata: metadata || {},
+    version: '1.0.0'
+  };
+
+  // Create tags for querying
+  const tags = [
+    { name: 'Content-Type', value: 'application/json' },
+    { name: 'App-Name', value: 'IrysUsername' },
+    { name: 'Type', value: 'username-registration' },
+    { name: 'Username', value: username.toLowerCase() },
+    { name: 'Owner', value: owner.toLowerCase() },
+    { name: 'Timestamp', value: registeredAt.toString() },
+    { name: 'Version', value: '1.0.0' }
+  ];
+
+  console.log('📤 Uploading username data to Irys:', {
+    username: username.toLowerCase(),
+    owner: owner.toLowerCase()
+  });
+
+  // Upload to Irys
+  const options = { tags: tags };
+  if (anchor) {
+    options.anchor = anchor;
+  }
+  const receipt = await irys.upload(JSON.stringify(usernameData), options);
+
+  console.log('✅ Upload successful:', {
+    id: receipt.id,
+    timestamp: receipt.timestamp
+  });
+
+  return {
+    success: true,
+    id: receipt.id,
+    timestamp: receipt.timestamp,
+    username: username.toLowerCase(),
+    owner: owner.toLowerCase(),
+    explorer_url: `https://devnet.irys.xyz/${receipt.id}`
+  };
+};
+
 // Upload username data to Irys
 app.post('/upload', async (req, res) => {
   try {
-    const { username, owner, metadata } = req.body;
+    const { username, owner, metadata, timestamp, anchor } = req.body;
     
     if (!username || !owner) {
       return res.status(400).json({ error: 'Username and owner are required' });
@@ -53,52 +108,51 @@ app.post('/upload', async (req, res) => {
       await initializeIrys();
     }
 
-    // Prepare username data
-    const usernameData = {
-      username: username.toLowerCase(),
-      owner: owner.toLowerCase(),
-      timestamp: Date.now(),
-      metadata: metadata || {},
-      version: '1.0.0'
-    };
-
-    // Create tags for querying
-    const tags = [
-      { name: 'Content-Type', value: 'application/json' },
-      { name: 'App-Name', value: 'IrysUsername' },
-      { name: 'Type', value: 'username-registration' },
-      { name: 'Username', value: username.toLowerCase() },
-      { name: 'Owner', value: owner.toLowerCase() },
-      { name: 'Timestamp', value: Date.now().toString() },
-      { name: 'Version', value: '1.0.0' }
-    ];
-
-    console.log('📤 Uploading username data to Irys:', {
-      username: username.toLowerCase(),
-      owner: owner.toLowerCase()
-    });
+    res.json(await uploadUsername({ username, owner, metadata, timestamp, anchor }));
 
-    // Upload to Irys
-    const receipt = await irys.upload(JSON.stringify(usernameData), {
-      tags: tags
+  } catch (error) {
+    console.error('❌ Upload error:', error);
+    res.status(500).json({ 
+      success: false, 
+      error: error.message 
     });
+  }
+});
 
-    console.log('✅ Upload successful:', {
-      id: receipt.id,
-      timestamp: receipt.timestamp
-    });
+// Upload many username registrations in parallel; results are returned in request order
+app.post('/upload/batch', async (req, res) => {
+  try {
+    const { items } = req.body;
 
-    res.json({
-      success: true,
-      id: receipt.id,
-      timestamp: receipt.timestamp,
-      username: username.toLowerCase(),
-      owner: owner.toLowerCase(),
-      explorer_url: `https://devnet.irys.xyz/${receipt.id}`
-    });
+    if (!Array.isArray(items) || items.length === 0) {
+      return res.status(400).json({ error: 'items must be a non-empty array' });
+    }
+    if (items.length > MAX_BATCH_ITEMS) {
+      return res.status(400).json({ error: `At most ${MAX_BATCH_ITEMS} items per batch` });
+    }
+
+    if (!irys) {
+      await initializeIrys();
+    }
+
+    const settled = await Promise.allSettled(items.map((item) => {
+      if (!item || !item.username || !item.owner) {
+        return Promise.reject(new Error('Username and owner are required'));
+      }
+      return uploadUsername(item);
+    }));
+
+    const results = settled.map((outcome) => (
+      outcome.status === 'fulfilled'
+        ? outcome.value
+        : { success: false, error: outcome.reason.message }
+    ));
+
+    console.log(`📦 Batch upload finished: ${results.filter((r) => r.success).length}/${results.length} succeeded`);
+    res.json({ results });
 
   } catch (error) {
-    console.error('❌ Upload error:', error);
+    console.error('❌ Batch upload error:', error);
     res.status(500).json({ 
       success: false, 
       error: error.message 
@@ -0,0 +1,34 @@
+"""JSON encoding shared by responses, the outbox journal and the stats document; uses orjson when it is installed"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the stdlib encoder
+    orjson = None
+
+def _json_default(value: Any):
+    # Tuple-backed records serialize as objects, not arrays
+    if hasattr(value, "_asdict"):
+        return value._asdict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _stdlib_jsonable(value: Any) -> Any:
+    # The stdlib encoder writes tuples as arrays before consulting default, so convert records up front
+    if hasattr(value, "_asdict"):
+        return value._asdict()
+    if isinstance(value, dict):
+        return {key: _stdlib_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_stdlib_jsonable(item) for item in value]
+    return value
+
+def dumps_json(value: Any) -> bytes:
+    """Serialize a response payload, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default)
+    return json.dumps(_stdlib_jsonable(value), separators=(",", ":")).encode()
+
+def loads_json(content: bytes) -> Any:
+    return orjson.loads(content) if orjson is not None else json.loads(content)
@@ -0,0 +1,134 @@
+"""Prometheus-style request metrics and per-request Server-Timing entries"""
+
+import time
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List, Tuple
+
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed bucket bounds in seconds"""
+
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+class Metrics:
+    """Minimal Prometheus-style counters and histograms rendered in the text exposition format"""
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self.histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], LatencyHistogram] = {}
+        self.help: Dict[str, str] = {}
+
+    def inc(self, name: str, labels: Dict[str, str], value: float = 1.0):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: Dict[str, str], seconds: float):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    @staticmethod
+    def _labels(labels, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(labels) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self, samples: List[Tuple[str, str, Dict[str, str], float]]) -> str:
+        """Render tracked metrics plus point-in-time (name, kind, labels, value) samples"""
+        lines = []
+        families: Dict[str, List[str]] = {}
+        for (name, labels), value in sorted(self.counters.items()):
+            families.setdefault(f"{name} counter", []).append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            histogram_lines = families.setdefault(f"{name} histogram", [])
+            for bound, count in histogram.snapshot()["buckets"].items():
+                histogram_lines.append(f"{name}_bucket{self._labels(labels, ('le', bound))} {count}")
+            histogram_lines.append(f"{name}_sum{self._labels(labels)} {histogram.sum}")
+            histogram_lines.append(f"{name}_count{self._labels(labels)} {histogram.count}")
+        for name, kind, labels, value in samples:
+            families.setdefault(f"{name} {kind}", []).append(
+                f"{name}{self._labels(tuple(sorted(labels.items())))} {value}"
+            )
+        
+        for family, family_lines in families.items():
+            name, kind = family.split(" ")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(family_lines)
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+# Per-request timings collected for the Server-Timing header
+request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+def record_timing(name: str, seconds: float):
+    timings = request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+class MetricsMiddleware:
+    """Counts requests and times them per route; optionally adds a Server-Timing header"""
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        timings: List[Tuple[str, float]] = []
+        token = request_timings.set(timings)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if self.server_timing:
+                    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings]
+                    entries.append(f"app;dur={(time.perf_counter() - started) * 1000:.2f}")
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", ", ".join(entries).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_timings.reset(token)
+            route = scope.get("route")
+            labels = {
+                "method": scope["method"],
+                "route": getattr(route, "path", "unmatched"),
+                "status": str(status["code"]),
+            }
+            metrics.inc("http_requests_total", labels)
+            metrics.observe("http_request_duration_seconds", labels, time.perf_counter() - started)
@@ -0,0 +1,308 @@
+"""Durable SQLite journal of verified registrations, uploaded by background workers with retries"""
+
+import asyncio
+import logging
+import random
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, NamedTuple
+
+from jsonutil import dumps_json, loads_json
+from metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+class OutboxEntry(NamedTuple):
+    """A registration accepted into the outbox; the ticket doubles as the upload's idempotency key"""
+    ticket: str
+    username: str
+    owner: str
+    metadata: Dict[str, Any]
+    timestamp: int
+    status: str
+    attempts: int
+    tx_id: Optional[str]
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+
+class RegistrationOutbox:
+    """Durable queue of verified registrations, drained to Irys by a pool of background workers
+
+    Entries are committed to SQLite (synchronous=FULL) before the client gets its ticket, so an
+    accepted registration survives a crash. Workers claim entries with a lease: an entry left
+    "uploading" by a dead process is picked up again once its lease runs out. Several server
+    processes may share the file; claims are single UPDATE statements, so each entry has one owner.
+    Every statement runs on one dedicated thread, so a file locked by another process holds up
+    the outbox rather than the event loop.
+
+    The outbox file is local to a node, so with reservations given, the name's shared reservation
+    stays held from enqueue until the entry is confirmed or fails: it is renewed for a lease on every
+    claim and across retry delays, and released by _finish. An entry whose name another owner has
+    reserved in the meantime is not uploaded but retried, and the retry looks up which registration landed.
+    """
+
+    COLUMNS = "ticket, username, owner, metadata, timestamp, status, attempts, tx_id, error, created_at, updated_at"
+    OPEN_STATUSES = ("pending", "uploading")
+
+    def __init__(self, path: str, workers: int, max_attempts: int, retry_base: float, retry_max: float,
+                 lease: float, poll_interval: float, retention: float, reservations=None):
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.reservations = reservations
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox-sqlite")
+        self._deliver = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._closing = False
+        self.in_progress = 0
+        self.enqueued = 0
+        self.conflicts = 0
+        self.confirmed = 0
+        self.retried = 0
+        self.failed = 0
+        self.delivery_latency = LatencyHistogram((0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0))
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=FULL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "ticket TEXT PRIMARY KEY, username TEXT NOT NULL, owner TEXT NOT NULL, metadata TEXT NOT NULL, "
+                "timestamp INTEGER NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "tx_id TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+                "next_attempt_at REAL NOT NULL)"
+            )
+            # At most one open registration per name, across every process using the file
+            self._db.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS outbox_open_username ON outbox (username) "
+                "WHERE status IN ('pending', 'uploading')"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+        return self._db
+
+    @staticmethod
+    def _entry(row) -> OutboxEntry:
+        return OutboxEntry(row[0], row[1], row[2], loads_json(row[3]), *row[4:])
+
+    async def start(self, deliver):
+        """Start the workers; deliver(entry) uploads one entry and returns the uploader's result dict"""
+        pending = await self._run(self._count_open)
+        self._deliver = deliver
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Registration outbox ready ({self.workers} workers, {pending} registrations to upload)")
+
+    async def close(self):
+        # wait_for() can swallow a cancel that lands as the wakeup fires, so idle workers also check the flag
+        self._closing = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self._run(self._close)
+
+    def _close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _count_open(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'uploading')").fetchone()[0]
+
+    async def holder(self, username: str) -> Optional[str]:
+        """Ticket of the open registration for username, if any"""
+        return await self._run(self._holder, username)
+
+    def _holder(self, username: str) -> Optional[str]:
+        row = self.db.execute(
+            "SELECT ticket FROM outbox WHERE username = ? AND status IN ('pending', 'uploading')", (username,)
+        ).fetchone()
+        return row[0] if row else None
+
+    async def open_usernames(self, usernames: List[str]) -> set:
+        """Which of the names have an open registration"""
+        return await self._run(self._open_usernames, usernames)
+
+    def _open_usernames(self, usernames: List[str]) -> set:
+        found = set()
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(usernames), 500):
+            chunk = usernames[start:start + 500]
+            found.update(row[0] for row in self.db.execute(
+                f"SELECT username FROM outbox WHERE username IN ({', '.join('?' * len(chunk))}) "
+                "AND status IN ('pending', 'uploading')", chunk
+            ))
+        return found
+
+    async def enqueue(self, username: str, owner: str, metadata: Dict[str, Any]) -> Optional[OutboxEntry]:
+        """Durably record a registration; returns None if the name already has one open"""
+        entry = await self._run(self._enqueue, username, owner, metadata)
+        if entry is not None and self._wakeup is not None:
+            self._wakeup.set()
+        return entry
+
+    def _enqueue(self, username: str, owner: str, metadata: Dict[str, Any]) -> Optional[OutboxEntry]:
+        now = time.time()
+        entry = OutboxEntry(
+            ticket=uuid.uuid4().hex,
+            username=username,
+            owner=owner,
+            metadata=metadata or {},
+            timestamp=int(now * 1000),
+            status="pending",
+            attempts=0,
+            tx_id=None,
+            error=None,
+            created_at=now,
+            updated_at=now,
+        )
+        try:
+            self.db.execute(
+                f"INSERT INTO outbox ({self.COLUMNS}, next_attempt_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (*entry[:3], dumps_json(entry.metadata).decode(), *entry[4:], now)
+            )
+        except sqlite3.IntegrityError:
+            self.conflicts += 1
+            return None
+        self.enqueued += 1
+        if self.enqueued % 1000 == 0:
+            self.db.execute(
+                "DELETE FROM outbox WHERE status IN ('confirmed', 'failed') AND updated_at <= ?",
+                (now - self.retention,)
+            )
+        return entry
+
+    async def get(self, ticket: str) -> Optional[OutboxEntry]:
+        return await self._run(self._get, ticket)
+
+    def _get(self, ticket: str) -> Optional[OutboxEntry]:
+        row = self.db.execute(f"SELECT {self.COLUMNS} FROM outbox WHERE ticket = ?", (ticket,)).fetchone()
+        return self._entry(row) if row else None
+
+    async def claim(self) -> Optional[OutboxEntry]:
+        """Take the next due entry, or one whose previous worker's lease has expired"""
+        return await self._run(self._claim)
+
+    def _claim(self) -> Optional[OutboxEntry]:
+        now = time.time()
+        row = self.db.execute(
+            "UPDATE outbox SET status = 'uploading', attempts = attempts + 1, updated_at = ? "
+            "WHERE ticket = (SELECT ticket FROM outbox "
+            "WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'uploading' AND updated_at <= ?) "
+            "ORDER BY next_attempt_at LIMIT 1) "
+            f"RETURNING {self.COLUMNS}",
+            (now, now, now - self.lease)
+        ).fetchone()
+        return self._entry(row) if row else None
+
+    async def _finish(self, entry: OutboxEntry, status: str, tx_id: Optional[str], error: Optional[str],
+                      next_attempt_at: float = 0):
+        await self._run(self._update, entry.ticket, status, tx_id, error, next_attempt_at)
+        if self.reservations is None:
+            return
+        if status == "pending":
+            await self.reservations.renew(entry.username, entry.owner, max(0.0, next_attempt_at - time.time()) + self.lease)
+        else:
+            await self.reservations.release(entry.username, entry.owner)
+
+    def _update(self, ticket: str, status: str, tx_id: Optional[str], error: Optional[str], next_attempt_at: float):
+        self.db.execute(
+            "UPDATE outbox SET status = ?, tx_id = ?, error = ?, updated_at = ?, next_attempt_at = ? WHERE ticket = ?",
+            (status, tx_id, error, time.time(), next_attempt_at, ticket)
+        )
+
+    def retry_delay(self, attempts: int) -> float:
+        """Exponential backoff with jitter, so a recovering upstream isn't hit by every entry at once"""
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _worker(self):
+        while not self._closing:
+            try:
+                entry = await self.claim()
+                if entry is None:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._wakeup.clear()
+                    continue
+                await self._process(entry)
+            except Exception as error:
+                # A locked or unwritable file must not take the worker down; a claimed entry comes back after its lease
+                logger.error(f"Outbox worker error: {error}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _process(self, entry: OutboxEntry):
+        self.in_progress += 1
+        try:
+            if self.reservations is not None and not await self.reservations.renew(entry.username, entry.owner, self.lease):
+                result = {"success": False, "error": "Username registration in progress elsewhere"}
+            else:
+                result = await self._deliver(entry)
+        except asyncio.CancelledError:
+            # Shutting down: hand the entry straight back instead of waiting out the lease
+            await self._finish(entry, "pending", None, entry.error, time.time())
+            raise
+        except Exception as error:
+            result = {"success": False, "error": str(error) or type(error).__name__}
+        finally:
+            self.in_progress -= 1
+
+        if result.get("success"):
+            await self._finish(entry, "confirmed", result["id"], None)
+            self.confirmed += 1
+            self.delivery_latency.observe(time.time() - entry.created_at)
+            logger.info(f"Outbox delivered '{entry.username}' (ticket {entry.ticket}, tx {result['id']}, attempt {entry.attempts})")
+        elif result.get("retry") is False or entry.attempts >= self.max_attempts:
+            await self._finish(entry, "failed", None, result.get("error"))
+            self.failed += 1
+            logger.error(f"Outbox gave up on '{entry.username}' (ticket {entry.ticket}) after {entry.attempts} attempts: {result.get('error')}")
+        else:
+            delay = self.retry_delay(entry.attempts)
+            await self._finish(entry, "pending", None, result.get("error"), time.time() + delay)
+            self.retried += 1
+            logger.info(f"Outbox retrying '{entry.username}' in {delay:.1f}s: {result.get('error')}")
+
+    async def stats(self) -> Dict[str, Any]:
+        counts = await self._run(self._status_counts)
+        return {
+            "pending": counts.get("pending", 0),
+            "uploading": counts.get("uploading", 0),
+            "confirmed": counts.get("confirmed", 0),
+            "failed": counts.get("failed", 0),
+            "workers": len(self._tasks),
+            "in_progress": self.in_progress,
+            "enqueued_total": self.enqueued,
+            "confirmed_total": self.confirmed,
+            "retried_total": self.retried,
+            "failed_total": self.failed,
+            "conflicts": self.conflicts,
+            "delivery_latency": self.delivery_latency.snapshot(),
+        }
+
+    def _status_counts(self) -> Dict[str, int]:
+        return dict(self.db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
@@ -0,0 +1,822 @@
+"""Local mirror of the username registrations: SQLite journal, mapped snapshot, search index and stats aggregates"""
+
+import asyncio
+import bisect
+import hashlib
+import heapq
+import logging
+import math
+import mmap
+import os
+import sqlite3
+import struct
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+class UsernameRecord(NamedTuple):
+    """A registration as held in caches and the registry and returned by the API (tuple-backed to keep it light)"""
+    id: str
+    username: str
+    owner: str
+    timestamp: int
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over a blake2b digest"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Levenshtein distance between a and b, or max_distance + 1 as soon as it is known to exceed max_distance"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        row_best = i
+        for j, char_b in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            current.append(cost)
+            if cost < row_best:
+                row_best = cost
+        if row_best > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+class UsernameIndex:
+    """Sorted array for prefix search plus a length-bucketed bigram index for edit-distance search"""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self._pending: List[str] = []
+        self._by_length: Dict[int, List[str]] = {}
+        # Length buckets with names appended since they were last sorted
+        self._unsorted_lengths: set = set()
+        self._grams: Dict[Tuple[int, str], List[str]] = {}
+
+    @staticmethod
+    def _bigrams(name: str) -> List[str]:
+        # Padded bigrams, numbered by occurrence so that counting shared grams is a multiset intersection
+        padded = f"^{name}$"
+        seen: Dict[str, int] = {}
+        grams = []
+        for i in range(len(padded) - 1):
+            gram = padded[i:i + 2]
+            seen[gram] = seen.get(gram, 0) + 1
+            grams.append(f"{gram}{seen[gram]}")
+        return grams
+
+    def add(self, name: str):
+        self._pending.append(name)
+        self._by_length.setdefault(len(name), []).append(name)
+        self._unsorted_lengths.add(len(name))
+        for gram in self._bigrams(name):
+            self._grams.setdefault((len(name), gram), []).append(name)
+
+    def _merge_pending(self):
+        if len(self._pending) < 64:
+            for name in self._pending:
+                bisect.insort(self.names, name)
+        else:
+            self.names.extend(self._pending)
+            self.names.sort()
+        self._pending = []
+
+    @staticmethod
+    def _sorted_in_chunks(names: List[str], chunk: int = 8192) -> List[str]:
+        # One list.sort() of a whole registry holds the GIL for tens of milliseconds; short sorts joined by
+        # a Python-level merge let the event loop thread run in between
+        return list(heapq.merge(*[sorted(names[start:start + chunk]) for start in range(0, len(names), chunk)]))
+
+    def sort(self):
+        """Put everything added so far in order, which searches otherwise do on demand; for a build thread"""
+        if self._pending:
+            self.names = list(heapq.merge(self.names, self._sorted_in_chunks(self._pending)))
+            self._pending = []
+        for length in self._unsorted_lengths:
+            self._by_length[length] = self._sorted_in_chunks(self._by_length[length])
+        self._unsorted_lengths.clear()
+
+    def prefix(self, prefix: str, limit: int) -> List[str]:
+        """Names starting with prefix, in alphabetical order"""
+        if self._pending:
+            self._merge_pending()
+        start = bisect.bisect_left(self.names, prefix)
+        matches = []
+        for name in self.names[start:start + limit]:
+            if not name.startswith(prefix):
+                break
+            matches.append(name)
+        return matches
+
+    def _bucket(self, length: int) -> List[str]:
+        """Names of one length, in alphabetical order"""
+        if length in self._unsorted_lengths:
+            self._by_length[length].sort()
+            self._unsorted_lengths.discard(length)
+        return self._by_length.get(length, [])
+
+    def _candidates(self, name: str, grams: List[str], distance: int):
+        """Names that may be within distance edits of name, in alphabetical order"""
+        runs = []
+        for length in range(max(1, len(name) - distance), len(name) + distance + 1):
+            # q-gram lemma: each edit destroys at most two padded bigrams
+            needed = max(len(name), length) + 1 - 2 * distance
+            if needed <= 0:
+                # Too short for the filter to rule anything out (3-character names at distance 2)
+                runs.append(self._bucket(length))
+                continue
+            shared: Dict[str, int] = {}
+            for gram in grams:
+                for candidate in self._grams.get((length, gram), ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+            runs.append(sorted(candidate for candidate, count in shared.items() if count >= needed))
+        return heapq.merge(*runs)
+
+    def similar(self, name: str, max_distance: int, limit: int) -> List[Tuple[str, int]]:
+        """Names within max_distance edits of name, closest first, then alphabetically.
+
+        Each distance is searched only for the places closer matches left, walking candidates in alphabetical
+        order and stopping once those are filled, so short names with thousands of matches stay cheap.
+        """
+        grams = self._bigrams(name)
+        matches = []
+        for distance in range(1, max_distance + 1):
+            wanted = limit - len(matches)
+            if wanted <= 0:
+                break
+            for candidate in self._candidates(name, grams, distance):
+                if edit_distance(name, candidate, distance) == distance:
+                    matches.append((candidate, distance))
+                    wanted -= 1
+                    if not wanted:
+                        break
+        return matches
+
+class RegistryAggregates:
+    """Registration counts kept up to date as records are applied: per day, per owner and the newest names"""
+
+    DAY_MS = 86_400_000
+
+    def __init__(self, newest_size: int):
+        if newest_size < 1:
+            raise ValueError(f"newest_size must be at least 1, got {newest_size}")
+        self.newest_size = newest_size
+        self.total = 0
+        self.per_day: Dict[int, int] = {}
+        self.owner_counts: Dict[str, int] = {}
+        # Owners grouped by how many names they hold, with the distinct counts kept sorted for top-N walks
+        self._owners_by_count: Dict[int, set] = {}
+        self._counts: List[int] = []
+        # The newest records as (timestamp, username, record) ascending. Twice the served size is kept so that
+        # replaced records leave spares to promote instead of holes that only a full rebuild could fill.
+        self._newest: List[Tuple[int, str, UsernameRecord]] = []
+        self.newest_capacity = newest_size * 2
+        self.version = 0
+
+    def _move_owner(self, owner: str, delta: int):
+        old = self.owner_counts.get(owner, 0)
+        new = old + delta
+        if old:
+            bucket = self._owners_by_count[old]
+            bucket.discard(owner)
+            if not bucket:
+                del self._owners_by_count[old]
+                del self._counts[bisect.bisect_left(self._counts, old)]
+        if new:
+            self.owner_counts[owner] = new
+            bucket = self._owners_by_count.get(new)
+            if bucket is None:
+                bucket = self._owners_by_count[new] = set()
+                bisect.insort(self._counts, new)
+            bucket.add(owner)
+        else:
+            del self.owner_counts[owner]
+
+    def add(self, record: UsernameRecord):
+        self.total += 1
+        day = record.timestamp // self.DAY_MS
+        self.per_day[day] = self.per_day.get(day, 0) + 1
+        self._move_owner(record.owner.lower(), 1)
+        entry = (record.timestamp, record.username, record)
+        # An older record only joins while the list still holds every record; otherwise newer unseen ones may
+        # exist. Once replacements have emptied the list nothing is known to be newest, so it stays stale.
+        if len(self._newest) == self.total - 1 or (self._newest and entry[:2] > self._newest[0][:2]):
+            bisect.insort(self._newest, entry)
+            if len(self._newest) > self.newest_capacity:
+                del self._newest[0]
+        self.version += 1
+
+    def remove(self, record: UsernameRecord):
+        self.total -= 1
+        day = record.timestamp // self.DAY_MS
+        self.per_day[day] -= 1
+        if not self.per_day[day]:
+            del self.per_day[day]
+        self._move_owner(record.owner.lower(), -1)
+        for i, entry in enumerate(self._newest):
+            if entry[1] == record.username:
+                del self._newest[i]
+                break
+        self.version += 1
+
+    @property
+    def stale(self) -> bool:
+        """Whether replacements have used up the spares, so the newest list is short until a rebuild"""
+        return len(self._newest) < min(self.newest_size, self.total)
+
+    def top_owners(self, limit: int) -> List[Tuple[str, int]]:
+        """Owners holding the most names, ties broken by address"""
+        top = []
+        for count in reversed(self._counts):
+            for owner in heapq.nsmallest(limit - len(top), self._owners_by_count[count]):
+                top.append((owner, count))
+            if len(top) >= limit:
+                break
+        return top
+
+    def newest(self) -> List[UsernameRecord]:
+        return [entry[2] for entry in reversed(self._newest[-self.newest_size:])]
+
+    def days(self, limit: int) -> List[Tuple[str, int]]:
+        """Registrations per UTC day for the most recent limit days that had any, oldest first"""
+        recent = heapq.nlargest(limit, self.per_day)
+        return [
+            (time.strftime("%Y-%m-%d", time.gmtime(day * self.DAY_MS // 1000)), self.per_day[day])
+            for day in sorted(recent)
+        ]
+
+class RegistrySnapshot:
+    """Read-only, memory-mapped binary image of the registry, shared through the page cache by every worker
+
+    Layout (little-endian): header, sync cursor, Bloom filter bits, one fixed-width entry per record in
+    registration order, record positions sorted by username, record positions sorted by owner, string blob.
+    The header carries the id of the registry database it was taken from, so a snapshot is never
+    combined with a different database.
+    """
+
+    MAGIC = b"IRYSREG1"
+    VERSION = 2
+    HEADER = struct.Struct("<8sIIIIIdIIq16s")
+    ENTRY = struct.Struct("<IHIHIHq")
+    POSITION = struct.Struct("<I")
+    NAME = struct.Struct("<IH")
+    MAX_STRING = 0xFFFF
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, self.count, cursor_length, self.owner_count, self.bloom_capacity,
+             self.bloom_error_rate, self.bloom_count, bloom_length, self.max_rowid,
+             registry_id) = self.HEADER.unpack_from(self._map, 0)
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError("not a registry snapshot (or an older format)")
+            self.registry_id = registry_id.hex()
+            offset = self.HEADER.size
+            self.cursor = self._map[offset:offset + cursor_length].decode() or None
+            offset += cursor_length
+            self._bloom_offset, self._bloom_length = offset, bloom_length
+            offset += bloom_length
+            self._entries = offset
+            self._by_name = self._entries + self.count * self.ENTRY.size
+            self._by_owner = self._by_name + self.count * self.POSITION.size
+            self._blob = self._by_owner + self.count * self.POSITION.size
+            if self._blob > len(self._map):
+                raise ValueError("truncated registry snapshot")
+        except Exception:
+            self._map.close()
+            raise
+
+    def close(self):
+        self._map.close()
+
+    def bloom_bits(self) -> bytes:
+        return self._map[self._bloom_offset:self._bloom_offset + self._bloom_length]
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._blob + offset
+        return self._map[start:start + length].decode()
+
+    def name_at(self, position: int) -> str:
+        name_offset, name_length = self.NAME.unpack_from(self._map, self._entries + position * self.ENTRY.size)
+        return self._string(name_offset, name_length)
+
+    def owner_at(self, position: int) -> str:
+        owner_offset, owner_length = self.NAME.unpack_from(self._map, self._entries + position * self.ENTRY.size + self.NAME.size)
+        return self._string(owner_offset, owner_length)
+
+    def record_at(self, position: int) -> UsernameRecord:
+        name_offset, name_length, owner_offset, owner_length, id_offset, id_length, timestamp = self.ENTRY.unpack_from(
+            self._map, self._entries + position * self.ENTRY.size
+        )
+        return UsernameRecord(
+            self._string(id_offset, id_length),
+            self._string(name_offset, name_length),
+            self._string(owner_offset, owner_length),
+            timestamp
+        )
+
+    def _sorted_position(self, table: int, index: int) -> int:
+        return self.POSITION.unpack_from(self._map, table + index * self.POSITION.size)[0]
+
+    def find(self, username: str) -> Optional[int]:
+        """Registration-order position of username, by binary search over the name table"""
+        # Hot path: compare raw bytes straight out of the map instead of decoding each probe
+        target = username.encode()
+        data, entries, by_name, blob, entry_size = self._map, self._entries, self._by_name, self._blob, self.ENTRY.size
+        unpack_position, unpack_name = self.POSITION.unpack_from, self.NAME.unpack_from
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            name_offset, name_length = unpack_name(data, entries + unpack_position(data, by_name + middle * 4)[0] * entry_size)
+            if data[blob + name_offset:blob + name_offset + name_length] < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count:
+            position = unpack_position(data, by_name + low * 4)[0]
+            name_offset, name_length = unpack_name(data, entries + position * entry_size)
+            if data[blob + name_offset:blob + name_offset + name_length] == target:
+                return position
+        return None
+
+    def positions_for_owner(self, owner: str) -> List[int]:
+        """Registration-order positions of the records owned by owner (lowercase)"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.owner_at(self._sorted_position(self._by_owner, middle)).lower() < owner:
+                low = middle + 1
+            else:
+                high = middle
+        positions = []
+        while low < self.count:
+            position = self._sorted_position(self._by_owner, low)
+            if self.owner_at(position).lower() != owner:
+                break
+            positions.append(position)
+            low += 1
+        return positions
+
+    @classmethod
+    def write(cls, path: str, records: List[UsernameRecord], cursor: Optional[str], bloom: BloomFilter,
+              max_rowid: int, registry_id: str):
+        """Write records (in registration order) to path atomically"""
+        blob = bytearray()
+        strings: Dict[str, Tuple[int, int]] = {}
+
+        def intern(value: str) -> Tuple[int, int]:
+            # Owners repeat across records, so each distinct string is stored once
+            location = strings.get(value)
+            if location is None:
+                data = value.encode()
+                if len(data) > cls.MAX_STRING:
+                    raise ValueError(f"string of {len(data)} bytes is too long for a registry snapshot")
+                location = strings[value] = (len(blob), len(data))
+                blob.extend(data)
+            return location
+
+        entries = bytearray()
+        for record in records:
+            entries += cls.ENTRY.pack(*intern(record.username), *intern(record.owner), *intern(record.id), record.timestamp)
+        by_name = sorted(range(len(records)), key=lambda position: records[position].username)
+        by_owner = sorted(range(len(records)), key=lambda position: (records[position].owner.lower(), position))
+        cursor_bytes = (cursor or "").encode()
+        bits = bytes(bloom.bits)
+
+        temporary = f"{path}.tmp{os.getpid()}"
+        with open(temporary, "wb") as f:
+            f.write(cls.HEADER.pack(
+                cls.MAGIC, cls.VERSION, len(records), len(cursor_bytes), len({record.owner.lower() for record in records}),
+                bloom.capacity, bloom.error_rate, bloom.count, len(bits), max_rowid, bytes.fromhex(registry_id)
+            ))
+            f.write(cursor_bytes)
+            f.write(bits)
+            f.write(entries)
+            f.write(b"".join(cls.POSITION.pack(position) for position in by_name))
+            f.write(b"".join(cls.POSITION.pack(position) for position in by_owner))
+            f.write(blob)
+        os.replace(temporary, path)
+
+class UsernameRegistry:
+    """Local mirror of all username registrations: a mapped snapshot plus in-memory records applied since, persisted to SQLite"""
+
+    def __init__(self, db_path: str, snapshot_path: Optional[str], sync_interval: float,
+                 bloom_capacity: int, bloom_error_rate: float, newest_size: int):
+        self.db_path = db_path
+        self.snapshot_path = snapshot_path
+        self.sync_interval = sync_interval
+        if newest_size < 1:
+            raise ValueError(f"newest_size must be at least 1, got {newest_size}")
+        self.newest_size = newest_size
+        self.snapshot: Optional[RegistrySnapshot] = None
+        # Records applied on top of the snapshot (all records when there is none)
+        self.records: Dict[str, UsernameRecord] = {}
+        self.by_owner: Dict[str, List[str]] = {}
+        # Names registered after the snapshot's, in registration order
+        self.order: List[str] = []
+        self.bloom = BloomFilter(bloom_capacity, bloom_error_rate)
+        self.bloom_negatives = 0
+        # Built in a thread by IrysService.build_index, then maintained by _set; searches wait for it
+        self.index: Optional[UsernameIndex] = None
+        # Names added while a build is running, replayed onto it by install_index
+        self.index_log: Optional[List[str]] = None
+        # Built in a thread by IrysService.build_aggregates, then maintained by _set
+        self.aggregates: Optional[RegistryAggregates] = None
+        # Records applied while a build is running, replayed onto it by install_aggregates
+        self.aggregate_log: Optional[List[Tuple[Optional[UsernameRecord], UsernameRecord]]] = None
+        self.cursor: Optional[str] = None
+        self.registry_id: Optional[str] = None
+        self.synced = False
+        self.last_sync: Optional[float] = None
+        self.changes_since_snapshot = 0
+        self.last_snapshot: Optional[float] = None
+        # Highest usernames rowid read back from the database, for refresh()
+        self.max_rowid = 0
+        self._db: Optional[sqlite3.Connection] = None
+        # One thread owns the connection, so waiting on another worker's write lock never blocks the event loop.
+        # The in-memory registry is only changed on the event loop (or during open, before anything else uses it).
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="registry-sqlite")
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def open(self):
+        """Load the snapshot and the rows written after it, on the database thread; returns once loaded"""
+        self._executor.submit(self._open).result()
+
+    def _open(self):
+        if self._db is not None:
+            return
+        self._db = sqlite3.connect(self.db_path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS usernames ("
+            "username TEXT PRIMARY KEY, id TEXT NOT NULL, owner TEXT NOT NULL, timestamp INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)")
+        # Random id of this database, recorded in every snapshot taken from it
+        self._db.execute("INSERT OR IGNORE INTO sync_state (key, value) VALUES ('registry_id', ?)", (uuid.uuid4().hex,))
+        self._db.commit()
+        self.registry_id = self._db.execute("SELECT value FROM sync_state WHERE key = 'registry_id'").fetchone()[0]
+        
+        started = time.perf_counter()
+        after_rowid = 0
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            try:
+                self.snapshot = RegistrySnapshot(self.snapshot_path)
+            except Exception as error:
+                logger.error(f"Ignoring unreadable registry snapshot {self.snapshot_path}: {error}")
+        if self.snapshot is not None and (
+            self.snapshot.registry_id != self.registry_id
+            or self._db.execute("SELECT COALESCE(MAX(rowid), 0) FROM usernames").fetchone()[0] < self.snapshot.max_rowid
+        ):
+            # Taken from another database (or this one before it was rebuilt): its records, filter and cursor don't apply
+            logger.warning(f"Ignoring registry snapshot {self.snapshot_path}: it does not match {self.db_path}")
+            self.snapshot.close()
+            self.snapshot = None
+        if self.snapshot is not None:
+            after_rowid = self.snapshot.max_rowid
+            self.bloom = BloomFilter(self.snapshot.bloom_capacity, self.snapshot.bloom_error_rate)
+            self.bloom.bits = bytearray(self.snapshot.bloom_bits())
+            self.bloom.count = self.snapshot.bloom_count
+        
+        # Only rows written after the snapshot need to be read back
+        for username, tx_id, owner, timestamp in self._db.execute(
+            "SELECT username, id, owner, timestamp FROM usernames WHERE rowid > ? ORDER BY rowid", (after_rowid,)
+        ):
+            self._set(UsernameRecord(tx_id, username, owner, timestamp))
+        self.max_rowid = self._db.execute("SELECT COALESCE(MAX(rowid), 0) FROM usernames").fetchone()[0]
+        row = self._db.execute("SELECT value FROM sync_state WHERE key = 'cursor'").fetchone()
+        self.cursor = row[0] if row else (self.snapshot.cursor if self.snapshot is not None else None)
+        logger.info(
+            f"Loaded {len(self)} usernames from local registry in {(time.perf_counter() - started) * 1000:.0f}ms "
+            f"(snapshot={self.snapshot is not None}, cursor={self.cursor})"
+        )
+
+    def close(self):
+        # Runs after any writes still queued on the database thread
+        self._executor.submit(self._close_db).result()
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+
+    def _close_db(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __len__(self) -> int:
+        return (self.snapshot.count if self.snapshot is not None else 0) + len(self.order)
+
+    def is_current(self) -> bool:
+        """Whether the registry has caught up recently enough to answer negative lookups"""
+        return (
+            self.synced
+            and self.last_sync is not None
+            and time.time() - self.last_sync < self.sync_interval * 3
+        )
+
+    def _lookup(self, username: str) -> Optional[UsernameRecord]:
+        record = self.records.get(username)
+        if record is None and self.snapshot is not None:
+            position = self.snapshot.find(username)
+            if position is not None:
+                record = self.snapshot.record_at(position)
+        return record
+
+    def _set(self, record: UsernameRecord):
+        """Store a record and keep the owner index and aggregates in step"""
+        previous = self._lookup(record.username)
+        if self.aggregates is not None:
+            if previous is not None:
+                self.aggregates.remove(previous)
+            self.aggregates.add(record)
+        if self.aggregate_log is not None:
+            self.aggregate_log.append((previous, record))
+        if previous is not None:
+            names = self.by_owner.get(previous.owner.lower())
+            if names and record.username in names:
+                names.remove(record.username)
+                if not names:
+                    del self.by_owner[previous.owner.lower()]
+        else:
+            self.order.append(record.username)
+            self._bloom_add(record.username)
+            if self.index is not None:
+                self.index.add(record.username)
+            if self.index_log is not None:
+                self.index_log.append(record.username)
+        self.records[record.username] = record
+        self.by_owner.setdefault(record.owner.lower(), []).append(record.username)
+
+    def names(self):
+        """All registered names in registration order"""
+        if self.snapshot is not None:
+            for position in range(self.snapshot.count):
+                yield self.snapshot.name_at(position)
+        yield from self.order
+
+    def all_records(self):
+        """All current records in registration order"""
+        if self.snapshot is not None:
+            for position in range(self.snapshot.count):
+                record = self.records.get(self.snapshot.name_at(position))
+                yield record or self.snapshot.record_at(position)
+        for name in self.order:
+            yield self.records[name]
+
+    def _bloom_add(self, username: str):
+        if self.bloom.count >= self.bloom.capacity:
+            # Rebuild at double capacity to keep the false positive rate in check
+            self.bloom = BloomFilter(self.bloom.capacity * 2, self.bloom.error_rate)
+            for name in self.names():
+                self.bloom.add(name)
+        else:
+            self.bloom.add(username)
+
+    def index_source(self):
+        """Everything build_index needs, captured on the event loop so the build can run in a thread"""
+        self.index_log = []
+        return self.snapshot, list(self.order)
+
+    @staticmethod
+    def build_index(source) -> UsernameIndex:
+        snapshot, order = source
+        index = UsernameIndex()
+        if snapshot is not None:
+            for position in range(snapshot.count):
+                index.add(snapshot.name_at(position))
+        for name in order:
+            index.add(name)
+        # Sort here rather than in the first search
+        index.sort()
+        return index
+
+    def install_index(self, index: UsernameIndex):
+        """Catch a finished build up with the names added since its source was captured, and start serving it"""
+        for name in self.index_log or ():
+            index.add(name)
+        self.index_log = None
+        self.index = index
+
+    def aggregates_source(self):
+        """Everything build_aggregates needs, captured on the event loop so the build can run in a thread"""
+        self.aggregate_log = []
+        return self.snapshot, dict(self.records), list(self.order), self.newest_size
+
+    @staticmethod
+    def build_aggregates(source) -> RegistryAggregates:
+        snapshot, overlay, order, newest_size = source
+        aggregates = RegistryAggregates(newest_size)
+        if snapshot is not None:
+            for position in range(snapshot.count):
+                record = snapshot.record_at(position)
+                aggregates.add(overlay.get(record.username, record))
+        for name in order:
+            aggregates.add(overlay[name])
+        return aggregates
+
+    def install_aggregates(self, aggregates: RegistryAggregates):
+        """Catch a finished build up with the records applied since its source was captured, and start serving it"""
+        for previous, record in self.aggregate_log or ():
+            if previous is not None:
+                aggregates.remove(previous)
+            aggregates.add(record)
+        self.aggregate_log = None
+        self.aggregates = aggregates
+
+    def get(self, username: str) -> Optional[UsernameRecord]:
+        # Names the filter has never seen skip the map lookup entirely
+        if username not in self.bloom:
+            self.bloom_negatives += 1
+            return None
+        return self._lookup(username)
+
+    def names_for_owner(self, owner: str) -> List[str]:
+        owner = owner.lower()
+        names = []
+        if self.snapshot is not None:
+            for position in self.snapshot.positions_for_owner(owner):
+                name = self.snapshot.name_at(position)
+                # Skip names whose record was since replaced by another owner's earlier registration
+                replaced = self.records.get(name)
+                if replaced is None or replaced.owner.lower() == owner:
+                    names.append(name)
+        names.extend(name for name in self.by_owner.get(owner, ()) if name not in names)
+        return names
+
+    def page(self, offset: int, limit: int) -> List[UsernameRecord]:
+        """Registrations in registration order, starting at offset"""
+        base = self.snapshot.count if self.snapshot is not None else 0
+        records = []
+        for position in range(offset, min(offset + limit, len(self))):
+            if position < base:
+                name = self.snapshot.name_at(position)
+                records.append(self.records.get(name) or self.snapshot.record_at(position))
+            else:
+                records.append(self.records[self.order[position - base]])
+        return records
+
+    async def apply(self, records: List[UsernameRecord], cursor: Optional[str] = None) -> List[UsernameRecord]:
+        """Persist a batch of registrations (earliest registration wins) and return the ones that were new.
+
+        Lookups see the new records straight away; the database write is then awaited on its thread.
+        """
+        added = []
+        for record in records:
+            existing = self._lookup(record.username)
+            if existing is not None and existing.timestamp <= record.timestamp:
+                continue
+            self._set(record)
+            added.append(record)
+        self.changes_since_snapshot += len(added)
+        
+        if self._db is not None and (added or cursor is not None):
+            await self._run(self._write, added, cursor)
+        if cursor is not None:
+            self.cursor = cursor
+        return added
+
+    def _write(self, added: List[UsernameRecord], cursor: Optional[str]):
+        if self._db is not None:
+            # Replaced rows move to a rowid past every existing one, so past any snapshot watermark too.
+            # Deleting and reinserting is not enough: SQLite reuses the rowid when the deleted row was the last.
+            self._db.executemany(
+                "UPDATE usernames SET rowid = (SELECT MAX(rowid) FROM usernames) + 1, id = ?, owner = ?, timestamp = ? "
+                "WHERE username = ? AND timestamp > ?",
+                [(r.id, r.owner, r.timestamp, r.username, r.timestamp) for r in added]
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO usernames (username, id, owner, timestamp) VALUES (?, ?, ?, ?)",
+                [(r.username, r.id, r.owner, r.timestamp) for r in added]
+            )
+            if cursor is not None:
+                self._set_state("cursor", cursor)
+            self._db.commit()
+
+    def _set_state(self, key: str, value: str):
+        self._db.execute(
+            "INSERT INTO sync_state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    def _write_last_sync(self, last_sync: float):
+        if self._db is not None:
+            self._set_state("last_sync", repr(last_sync))
+            self._db.commit()
+
+    async def mark_synced(self):
+        """Record a completed sync, here and in the database for workers that only refresh()"""
+        self.synced = True
+        self.last_sync = time.time()
+        if self._db is not None:
+            await self._run(self._write_last_sync, self.last_sync)
+
+    def _read_since(self, max_rowid: int):
+        if self._db is None:
+            return [], []
+        rows = self._db.execute(
+            "SELECT rowid, username, id, owner, timestamp FROM usernames WHERE rowid > ? ORDER BY rowid", (max_rowid,)
+        ).fetchall()
+        state = self._db.execute("SELECT key, value FROM sync_state WHERE key IN ('cursor', 'last_sync')").fetchall()
+        return rows, state
+
+    async def refresh(self) -> List[UsernameRecord]:
+        """Read back rows other workers have committed since the last look, and the sync leader's cursor and time"""
+        if self._db is None:
+            return []
+        rows, state = await self._run(self._read_since, self.max_rowid)
+        added = []
+        for rowid, username, tx_id, owner, timestamp in rows:
+            self.max_rowid = max(self.max_rowid, rowid)
+            existing = self._lookup(username)
+            if existing is not None and existing.timestamp <= timestamp:
+                # Our own writes come back here too
+                continue
+            record = UsernameRecord(tx_id, username, owner, timestamp)
+            self._set(record)
+            added.append(record)
+        for key, value in state:
+            if key == "cursor":
+                self.cursor = value
+            else:
+                self.last_sync = float(value)
+                self.synced = True
+        return added
+
+    def snapshot_state(self):
+        """Everything write_snapshot needs, captured on the event loop so the write can run in a thread.
+
+        The watermark is the last row open() or refresh() read back: every row up to it is reflected here, while
+        later ones (including this worker's own writes) are replayed from the database after loading the snapshot.
+        """
+        max_rowid = self.max_rowid
+        bloom = BloomFilter(self.bloom.capacity, self.bloom.error_rate)
+        bloom.bits, bloom.count = bytearray(self.bloom.bits), self.bloom.count
+        return self.snapshot, dict(self.records), list(self.order), self.cursor, bloom, max_rowid, self.registry_id
+
+    @staticmethod
+    def write_snapshot(path: str, state) -> int:
+        snapshot, overlay, order, cursor, bloom, max_rowid, registry_id = state
+        records = []
+        if snapshot is not None:
+            for position in range(snapshot.count):
+                record = snapshot.record_at(position)
+                records.append(overlay.get(record.username, record))
+        records.extend(overlay[name] for name in order)
+        RegistrySnapshot.write(path, records, cursor, bloom, max_rowid, registry_id)
+        return len(records)
+
+    def stats(self) -> Dict[str, Any]:
+        owners = len(self.by_owner)
+        if self.snapshot is not None:
+            owners += self.snapshot.owner_count - sum(
+                1 for owner in self.by_owner if self.snapshot.positions_for_owner(owner)
+            )
+        return {
+            "usernames": len(self),
+            "owners": owners,
+            "bloom": {
+                "capacity": self.bloom.capacity,
+                "bits": self.bloom.size,
+                "hashes": self.bloom.hashes,
+                "negatives": self.bloom_negatives,
+            },
+            "snapshot": {
+                "path": self.snapshot_path,
+                "mapped_records": self.snapshot.count if self.snapshot is not None else 0,
+                "changes_since": self.changes_since_snapshot,
+                "last_written": self.last_snapshot,
+            },
+            "cursor": self.cursor,
+            "synced": self.synced,
+            "last_sync": self.last_sync,
+        }
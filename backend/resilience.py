@@ -0,0 +1,241 @@
+"""Protection for the upstreams and for ourselves: request deadlines, circuit breaking, request coalescing and rate limiting"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+class UpstreamUnavailableError(Exception):
+    """The upstream could not give an answer (failure, deadline exhausted or circuit open)"""
+
+class CircuitOpenError(UpstreamUnavailableError):
+    pass
+
+class DeadlineExceededError(UpstreamUnavailableError):
+    pass
+
+class UpstreamSaturatedError(UpstreamUnavailableError):
+    """The upstream already has as many requests in flight as it is allowed"""
+
+# Absolute time.monotonic() deadline for the current request, if any
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+def deadline_timeout(default: float) -> float:
+    """Timeout for the next upstream call, bounded by what is left of the request deadline"""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return default
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceededError("Request deadline exceeded")
+    return min(default, remaining)
+
+class DeadlineMiddleware:
+    """Gives each HTTP request a deadline budget; clients may shorten it (down to min_budget) with X-Request-Timeout-Ms"""
+
+    def __init__(self, app, budget: float, min_budget: float):
+        self.app = app
+        self.budget = budget
+        self.min_budget = min(min_budget, budget)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        budget = self.budget
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-timeout-ms":
+                try:
+                    budget = min(budget, max(int(value) / 1000, self.min_budget))
+                except ValueError:
+                    pass
+        token = request_deadline.set(time.monotonic() + budget)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_deadline.reset(token)
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets a single probe through once the reset timeout passes"""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.rejected = 0
+        self.trips = 0
+
+    def before_call(self):
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self.probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is half-open")
+            self.probe_in_flight = True
+
+    def cancel_call(self):
+        """The call admitted by before_call never reached the upstream"""
+        self.probe_in_flight = False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.probe_in_flight = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+                logger.warning(f"Circuit breaker for {self.name} opened after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def retry_after(self) -> int:
+        if self.state != "open":
+            return 1
+        return max(1, int(self.reset_timeout - (time.monotonic() - self.opened_at)) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one shared in-flight task"""
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.deduplicated = 0
+
+    @staticmethod
+    async def _detached(fn):
+        # The shared call serves every caller, so it must not inherit the first caller's deadline;
+        # the task runs in its own copy of the context, so this does not leak back to the caller
+        request_deadline.set(None)
+        return await fn()
+
+    async def do(self, key: str, fn):
+        task = self._tasks.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(self._detached(fn))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            self.deduplicated += 1
+        # Shield so a cancelled caller does not cancel the lookup for everyone else; each caller
+        # still gives up when its own deadline runs out
+        deadline = request_deadline.get()
+        if deadline is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError as error:
+            raise DeadlineExceededError("Request deadline exceeded") from error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._tasks),
+            "leaders": self.leaders,
+            "deduplicated": self.deduplicated,
+        }
+
+class TokenBucket:
+    """Refills at rate tokens per second up to burst; each admitted request spends tokens"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1) -> float:
+        """Spend cost tokens; returns 0 if admitted, otherwise seconds until enough tokens accrue"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (cost - self.tokens) / self.rate
+
+    def refund(self, cost: float = 1):
+        self.tokens = min(self.burst, self.tokens + cost)
+
+class RateLimiter:
+    """Per-client and global token buckets for one class of endpoints
+
+    Client buckets live in an LRU bounded by max_clients; an evicted client simply starts
+    again with a full bucket, which errs on the side of admitting.
+    """
+
+    def __init__(self, name: str, client_rate: float, client_burst: float,
+                 global_rate: float, global_burst: float, max_clients: int):
+        self.name = name
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_clients = max_clients
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self._clients: OrderedDict = OrderedDict()
+        self.allowed = 0
+        self.limited_client = 0
+        self.limited_global = 0
+
+    def acquire(self, client: str, cost: float = 1) -> float:
+        """Admit a request from client; returns 0, or the number of seconds to wait before retrying"""
+        bucket = self._clients.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.client_rate, self.client_burst)
+            self._clients[client] = bucket
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+
+        wait = bucket.take(cost)
+        if wait:
+            self.limited_client += 1
+            return wait
+        wait = self.global_bucket.take(cost)
+        if wait:
+            # Don't charge the client for a request the server as a whole turned away
+            bucket.refund(cost)
+            self.limited_global += 1
+            return wait
+        self.allowed += 1
+        return 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self._clients),
+            "allowed": self.allowed,
+            "limited_client": self.limited_client,
+            "limited_global": self.limited_global,
+            "client_rate": self.client_rate,
+            "client_burst": self.client_burst,
+            "global_rate": self.global_bucket.rate,
+            "global_burst": self.global_bucket.burst,
+        }
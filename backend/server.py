@@ -1,25 +1,201 @@
 import os
 import json
 import asyncio
+import base64
+import hashlib
+import math
+import struct
+import time
+import uuid
 import httpx
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import Optional, Dict, Any, List
-from fastapi import FastAPI, HTTPException, Depends
+from typing import Optional, Dict, Any, List, Tuple
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from eth_utils import to_checksum_address
 from eth_account import Account
 from eth_account.messages import encode_defunct
+from eth_keys import keys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
 import logging
 
+from jsonutil import dumps_json, loads_json
+from metrics import LatencyHistogram, MetricsMiddleware, metrics, record_timing, request_timings
+from outbox import OutboxEntry, RegistrationOutbox
+from registry import UsernameRecord, UsernameRegistry
+from resilience import (
+    CircuitBreaker, DeadlineExceededError, DeadlineMiddleware, RateLimiter, SingleFlight,
+    UpstreamSaturatedError, UpstreamUnavailableError, deadline_timeout, request_deadline,
+)
+from state import ReservationTable, create_state_backend
+from validation import (
+    LOCAL_CURSOR_PREFIX, MAX_TX_ID_LENGTH, OWNER_PATTERN, SEARCH_TERM_PATTERN, TICKET_PATTERN,
+    is_valid_username, local_cursor_offset, normalize_address, require_valid_username,
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Irys Username API", version="1.0.0")
+ROOT_DIR = Path(__file__).parent
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared upstream connection pools on startup, close them on shutdown"""
+    await irys_service.start()
+    try:
+        yield
+    finally:
+        await irys_service.close()
+        signature_verifier.shutdown()
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson. Routes that return it directly also skip FastAPI's jsonable_encoder pass."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+app = FastAPI(title="Irys Username API", version="1.0.0", lifespan=lifespan, default_response_class=FastJSONResponse)
+
+# Environment variables
+PRIVATE_KEY = os.environ.get("PRIVATE_KEY", "725bbe9ad10ef6b48397d37501ff0c908119fdc0513a85a046884fc9157c80f5")
+IRYS_GATEWAY_URL = "https://gateway.irys.xyz"
+IRYS_GRAPHQL_URL = os.environ.get("IRYS_GRAPHQL_URL", "https://devnet.irys.xyz/graphql")
+IRYS_HELPER_URL = os.environ.get("IRYS_HELPER_URL", "http://localhost:3002")
+
+# Upload path: "helper" (Node service) or "native" (sign data items here and post them to the bundler)
+IRYS_UPLOADER = os.environ.get("IRYS_UPLOADER", "helper")
+IRYS_BUNDLER_URL = os.environ.get("IRYS_BUNDLER_URL", "https://devnet.irys.xyz")
+IRYS_TOKEN = os.environ.get("IRYS_TOKEN", "ethereum")
+
+# Upstream connection pool settings
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30.0"))
+HTTP2_ENABLED = os.environ.get("HTTP2_ENABLED", "true").lower() == "true"
+
+# Username lookup cache settings (registrations are append-only, so positives live long)
+USERNAME_CACHE_SIZE = int(os.environ.get("USERNAME_CACHE_SIZE", "10000"))
+USERNAME_CACHE_POSITIVE_TTL = float(os.environ.get("USERNAME_CACHE_POSITIVE_TTL", "3600"))
+USERNAME_CACHE_NEGATIVE_TTL = float(os.environ.get("USERNAME_CACHE_NEGATIVE_TTL", "5"))
+
+# Local registry mirrored from Irys GraphQL
+REGISTRY_DB_PATH = os.environ.get("REGISTRY_DB_PATH", str(ROOT_DIR / "registry.db"))
+REGISTRY_SYNC_ENABLED = os.environ.get("REGISTRY_SYNC_ENABLED", "true").lower() == "true"
+REGISTRY_SYNC_INTERVAL = float(os.environ.get("REGISTRY_SYNC_INTERVAL", "10"))
+REGISTRY_PAGE_SIZE = int(os.environ.get("REGISTRY_PAGE_SIZE", "100"))
+# With several workers only the holder of this lease (in the state backend) syncs and writes snapshots;
+# the others read the rows it commits to REGISTRY_DB_PATH
+REGISTRY_LEADER_LEASE = float(os.environ.get("REGISTRY_LEADER_LEASE", "60"))
+REGISTRY_LEADER_KEY = "registry:leader"
+
+# Memory-mapped registry snapshot for warm starts (empty path disables it)
+REGISTRY_SNAPSHOT_PATH = os.environ.get("REGISTRY_SNAPSHOT_PATH", str(ROOT_DIR / "registry.snapshot"))
+REGISTRY_SNAPSHOT_INTERVAL = float(os.environ.get("REGISTRY_SNAPSHOT_INTERVAL", "300"))
+
+# Leaderboard page size cap for the non-streaming JSON response
+LEADERBOARD_MAX_LIMIT = int(os.environ.get("LEADERBOARD_MAX_LIMIT", "1000"))
+
+# Search over the local registry
+SEARCH_MAX_LIMIT = int(os.environ.get("SEARCH_MAX_LIMIT", "100"))
+SEARCH_MAX_DISTANCE = 2
+SUGGESTION_COUNT = int(os.environ.get("SUGGESTION_COUNT", "5"))
+
+# Precomputed registry aggregates served by /api/stats
+STATS_TOP_OWNERS = int(os.environ.get("STATS_TOP_OWNERS", "10"))
+STATS_NEWEST = int(os.environ.get("STATS_NEWEST", "10"))
+STATS_MAX_DAYS = int(os.environ.get("STATS_MAX_DAYS", "90"))
+STATS_CACHE_MAX_AGE = int(os.environ.get("STATS_CACHE_MAX_AGE", "10"))
+
+# Live registration feed (SSE / WebSocket)
+FEED_BUFFER_SIZE = int(os.environ.get("FEED_BUFFER_SIZE", "256"))
+FEED_MAX_SUBSCRIBERS = int(os.environ.get("FEED_MAX_SUBSCRIBERS", "1000"))
+FEED_HEARTBEAT_INTERVAL = float(os.environ.get("FEED_HEARTBEAT_INTERVAL", "15"))
+
+# HTTP cache lifetimes (seconds). Registrations never change once written, but unregistered names can be taken at any time.
+RESOLVE_CACHE_MAX_AGE = int(os.environ.get("RESOLVE_CACHE_MAX_AGE", "3600"))
+RESOLVE_NEGATIVE_CACHE_MAX_AGE = int(os.environ.get("RESOLVE_NEGATIVE_CACHE_MAX_AGE", "5"))
+LEADERBOARD_CACHE_MAX_AGE = int(os.environ.get("LEADERBOARD_CACHE_MAX_AGE", "10"))
+
+# Upload batching towards the helper's /upload/batch endpoint
+UPLOAD_BATCHING_ENABLED = os.environ.get("UPLOAD_BATCHING_ENABLED", "true").lower() == "true"
+UPLOAD_BATCH_WINDOW = float(os.environ.get("UPLOAD_BATCH_WINDOW", "0.05"))
+UPLOAD_BATCH_MAX_ITEMS = int(os.environ.get("UPLOAD_BATCH_MAX_ITEMS", "25"))
+
+# Reservations held while a registration upload is in flight
+RESERVATION_TTL = float(os.environ.get("RESERVATION_TTL", "60"))
+
+# Registration outbox: verified registrations are written to a local SQLite journal, acknowledged with a ticket
+# and uploaded by background workers with retries
+OUTBOX_ENABLED = os.environ.get("OUTBOX_ENABLED", "true").lower() == "true"
+OUTBOX_DB_PATH = os.environ.get("OUTBOX_DB_PATH", str(ROOT_DIR / "outbox.db"))
+OUTBOX_WORKERS = int(os.environ.get("OUTBOX_WORKERS", "4"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_BASE = float(os.environ.get("OUTBOX_RETRY_BASE", "1.0"))
+OUTBOX_RETRY_MAX = float(os.environ.get("OUTBOX_RETRY_MAX", "60.0"))
+OUTBOX_LEASE = float(os.environ.get("OUTBOX_LEASE", "120.0"))
+OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", "1.0"))
+OUTBOX_RETENTION = float(os.environ.get("OUTBOX_RETENTION", str(7 * 24 * 3600)))
+
+# Shared state backend for reservations and the cross-worker lookup cache: "memory", "sqlite" or "redis"
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "memory")
+STATE_SQLITE_PATH = os.environ.get("STATE_SQLITE_PATH", str(ROOT_DIR / "state.db"))
+REDIS_URL = os.environ.get("REDIS_URL", "redis://127.0.0.1:6379/0")
+REDIS_POOL_SIZE = int(os.environ.get("REDIS_POOL_SIZE", "8"))
+
+# Number of server processes when run as __main__
+WORKERS = int(os.environ.get("WORKERS", "1"))
 
-# CORS configuration
+# GraphQL resilience: per-request deadline, circuit breaker and optional hedging to a secondary endpoint
+GRAPHQL_TIMEOUT = float(os.environ.get("GRAPHQL_TIMEOUT", "10.0"))
+REQUEST_DEADLINE = float(os.environ.get("REQUEST_DEADLINE", "8.0"))
+# Shortest budget a client may ask for with X-Request-Timeout-Ms
+REQUEST_DEADLINE_MIN = float(os.environ.get("REQUEST_DEADLINE_MIN", "0.5"))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.environ.get("BREAKER_RESET_TIMEOUT", "15.0"))
+IRYS_GRAPHQL_HEDGE_URL = os.environ.get("IRYS_GRAPHQL_HEDGE_URL") or None
+GRAPHQL_HEDGE_DELAY = float(os.environ.get("GRAPHQL_HEDGE_DELAY", "0.3"))
+
+# Admission control: token buckets (requests/second and burst) per client and overall, per endpoint class
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+TRUST_PROXY_HEADERS = os.environ.get("TRUST_PROXY_HEADERS", "false").lower() == "true"
+RATE_LIMIT_MAX_CLIENTS = int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", "10000"))
+REGISTER_CLIENT_RATE = float(os.environ.get("REGISTER_CLIENT_RATE", "0.5"))
+REGISTER_CLIENT_BURST = float(os.environ.get("REGISTER_CLIENT_BURST", "5"))
+REGISTER_GLOBAL_RATE = float(os.environ.get("REGISTER_GLOBAL_RATE", "20"))
+REGISTER_GLOBAL_BURST = float(os.environ.get("REGISTER_GLOBAL_BURST", "50"))
+CHECK_CLIENT_RATE = float(os.environ.get("CHECK_CLIENT_RATE", "10"))
+CHECK_CLIENT_BURST = float(os.environ.get("CHECK_CLIENT_BURST", "30"))
+CHECK_GLOBAL_RATE = float(os.environ.get("CHECK_GLOBAL_RATE", "500"))
+CHECK_GLOBAL_BURST = float(os.environ.get("CHECK_GLOBAL_BURST", "1000"))
+
+# Concurrent requests allowed per upstream before new ones are turned away (0 = no cap)
+GRAPHQL_MAX_IN_FLIGHT = int(os.environ.get("GRAPHQL_MAX_IN_FLIGHT", "64"))
+HELPER_MAX_IN_FLIGHT = int(os.environ.get("HELPER_MAX_IN_FLIGHT", "32"))
+BUNDLER_MAX_IN_FLIGHT = int(os.environ.get("BUNDLER_MAX_IN_FLIGHT", "32"))
+
+# Metrics
+SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+# Signature verification pool ("thread" or "process")
+SIGNATURE_WORKERS = int(os.environ.get("SIGNATURE_WORKERS", "4"))
+SIGNATURE_EXECUTOR = os.environ.get("SIGNATURE_EXECUTOR", "thread")
+SIGNATURE_CACHE_SIZE = int(os.environ.get("SIGNATURE_CACHE_SIZE", "1024"))
+
+# Bloom filter over registered names (grows by rebuilding when capacity is exceeded)
+REGISTRY_BLOOM_CAPACITY = int(os.environ.get("REGISTRY_BLOOM_CAPACITY", "100000"))
+REGISTRY_BLOOM_ERROR_RATE = float(os.environ.get("REGISTRY_BLOOM_ERROR_RATE", "0.01"))
+
+# Batch endpoint limits
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "500"))
+BATCH_QUERY_CHUNK = int(os.environ.get("BATCH_QUERY_CHUNK", "100"))
+
+# Middleware, innermost first: CORS, metrics, then deadlines (each one added wraps the ones before it)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -27,11 +203,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-# Environment variables
-PRIVATE_KEY = os.environ.get("PRIVATE_KEY", "725bbe9ad10ef6b48397d37501ff0c908119fdc0513a85a046884fc9157c80f5")
-IRYS_GATEWAY_URL = "https://gateway.irys.xyz"
-IRYS_GRAPHQL_URL = "https://devnet.irys.xyz/graphql"
+app.add_middleware(MetricsMiddleware, server_timing=SERVER_TIMING_ENABLED)
+app.add_middleware(DeadlineMiddleware, budget=REQUEST_DEADLINE, min_budget=REQUEST_DEADLINE_MIN)
 
 # Pydantic models
 class UsernameRegistrationRequest(BaseModel):
@@ -43,6 +216,7 @@ class UsernameRegistrationRequest(BaseModel):
 class UsernameAvailabilityResponse(BaseModel):
     username: str
     available: bool
+    suggestions: Optional[List[str]] = None
 
 class UsernameRegistrationResponse(BaseModel):
     success: bool
@@ -52,27 +226,900 @@ class UsernameRegistrationResponse(BaseModel):
     explorer_url: str
     message: str
 
-class UsernameRecord(BaseModel):
-    id: str
+class RegistrationTicketResponse(BaseModel):
+    success: bool
+    ticket: str
     username: str
     owner: str
-    timestamp: int
+    status: str
+    status_url: str
+    message: str
+
+class BatchUsernamesRequest(BaseModel):
+    usernames: List[str]
+
+class BatchAddressesRequest(BaseModel):
+    addresses: List[str]
+
+def record_from_node(node: Dict[str, Any], default_username: str = "") -> Optional[UsernameRecord]:
+    """Build a UsernameRecord from a GraphQL transaction node, or None if the node is malformed
+
+    Anyone can upload a transaction carrying the registration tags, so nothing in a node is trusted.
+    """
+    try:
+        username, owner, timestamp = default_username, "", 0
+        for tag in node["tags"]:
+            name = tag["name"]
+            if name == "Username":
+                username = tag["value"]
+            elif name == "Owner":
+                owner = tag["value"]
+            elif name == "Timestamp":
+                timestamp = int(tag["value"])
+        record = UsernameRecord(node["id"], username, owner, timestamp)
+    except (KeyError, TypeError, ValueError) as error:
+        logger.warning(f"Skipping malformed registration node: {error!r}")
+        return None
+    if (
+        not isinstance(record.id, str) or not 0 < len(record.id) <= MAX_TX_ID_LENGTH
+        or not is_valid_username(record.username)
+        or not isinstance(record.owner, str) or not OWNER_PATTERN.fullmatch(record.owner)
+        or not 0 <= record.timestamp < 2 ** 63
+    ):
+        logger.warning(f"Skipping invalid registration {str(record.id)[:MAX_TX_ID_LENGTH]!r} for {str(record.username)[:40]!r}")
+        return None
+    return record
+
+class UpstreamClient:
+    """Long-lived pooled HTTP client for a single upstream, with pool statistics"""
+
+    def __init__(self, name: str, base_url: str = "", http2: bool = False, max_in_flight: int = 0):
+        self.name = name
+        self.base_url = base_url
+        self.http2 = http2 and self._http2_available()
+        self.max_in_flight = max_in_flight
+        self.limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.in_flight = 0
+        self.requests = 0
+        self.waits = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _http2_available() -> bool:
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed, falling back to HTTP/1.1")
+            return False
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._transport = httpx.AsyncHTTPTransport(http2=self.http2, limits=self.limits)
+            self._client = httpx.AsyncClient(base_url=self.base_url, transport=self._transport)
+        return self._client
+
+    def check_capacity(self):
+        """Fail fast rather than queue behind requests the upstream is already working on"""
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            raise UpstreamSaturatedError(f"{self.name} upstream has {self.in_flight} requests in flight")
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        client = self.client
+        self.check_capacity()
+        if self.in_flight >= self.limits.max_connections:
+            self.waits += 1
+        self.in_flight += 1
+        self.requests += 1
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = await client.post(url, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            self.in_flight -= 1
+            elapsed = time.perf_counter() - started
+            metrics.observe("irys_upstream_request_duration_seconds", {"upstream": self.name, "status": status}, elapsed)
+            record_timing(self.name, elapsed)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._transport = None
+
+    def stats(self) -> Dict[str, Any]:
+        connections = []
+        pool = getattr(self._transport, "_pool", None)
+        if pool is not None:
+            connections = [conn for conn in pool.connections if not conn.is_closed()]
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {
+            "upstream": self.name,
+            "http2": self.http2,
+            "connections": len(connections),
+            "active": len(connections) - idle,
+            "idle": idle,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "waits": self.waits,
+            "rejected": self.rejected,
+            "max_in_flight": self.max_in_flight,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+        }
+
+class UsernameCache:
+    """Bounded LRU cache of username lookups with separate TTLs for hits and misses"""
+
+    MISS = object()
+
+    def __init__(self, max_size: int, positive_ttl: float, negative_ttl: float):
+        self.max_size = max_size
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return self.MISS
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            # Expired entries stay until evicted or refreshed so they can serve as a stale fallback
+            self.misses += 1
+            return self.MISS
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def get_stale(self, key: str):
+        """Return a positive entry even if it has expired, for use when the upstream is unavailable.
+
+        Expired negative answers are treated as misses: a name that was free an hour ago may be
+        taken now, and reporting it as available without the upstream would be a guess."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] is None:
+            return self.MISS
+        return entry[0]
+
+    def put(self, key: str, value: Optional[UsernameRecord]):
+        ttl = self.positive_ttl if value is not None else self.negative_ttl
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: str):
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+def deep_hash(chunk) -> bytes:
+    """Arweave deep hash (SHA-384) over nested lists of byte strings"""
+    if isinstance(chunk, list):
+        accumulator = hashlib.sha384(b"list" + str(len(chunk)).encode()).digest()
+        for item in chunk:
+            accumulator = hashlib.sha384(accumulator + deep_hash(item)).digest()
+        return accumulator
+    tag = hashlib.sha384(b"blob" + str(len(chunk)).encode()).digest()
+    return hashlib.sha384(tag + hashlib.sha384(chunk).digest()).digest()
+
+def _avro_long(value: int) -> bytes:
+    value = (value << 1) ^ (value >> 63)
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+def encode_tags(tags: List[Tuple[str, str]]) -> bytes:
+    """Avro-encode data item tags (an array of {name: bytes, value: bytes} records)"""
+    if not tags:
+        return b""
+    encoded = bytearray(_avro_long(len(tags)))
+    for name, value in tags:
+        for field in (name.encode(), value.encode()):
+            encoded += _avro_long(len(field))
+            encoded += field
+    encoded.append(0)
+    return bytes(encoded)
+
+class DataItemSigner:
+    """Builds ANS-104 data items signed with an Ethereum key (signature type 3), as the Irys SDK does"""
+
+    SIGNATURE_TYPE = 3
+
+    def __init__(self, private_key: str):
+        self.private_key = keys.PrivateKey(bytes.fromhex(private_key.removeprefix("0x")))
+        # Uncompressed secp256k1 public key
+        self.owner = b"\x04" + self.private_key.public_key.to_bytes()
+        self.address = self.private_key.public_key.to_checksum_address()
+
+    def sign(self, data: bytes, tags: List[Tuple[str, str]], anchor: Optional[bytes] = None) -> Tuple[str, bytes]:
+        """Return (data item id, serialized data item); signing is deterministic, so a fixed anchor gives a fixed id"""
+        encoded_tags = encode_tags(tags)
+        anchor = anchor or os.urandom(32)
+        message = deep_hash([
+            b"dataitem", b"1", str(self.SIGNATURE_TYPE).encode(),
+            self.owner, b"", anchor, encoded_tags, data
+        ])
+        signature = bytes(Account.sign_message(encode_defunct(primitive=message), private_key=self.private_key.to_bytes()).signature)
+        item = b"".join([
+            struct.pack("<H", self.SIGNATURE_TYPE), signature, self.owner,
+            b"\x00",  # no target
+            b"\x01", anchor,
+            struct.pack("<QQ", len(tags), len(encoded_tags)), encoded_tags,
+            data,
+        ])
+        item_id = base64.urlsafe_b64encode(hashlib.sha256(signature).digest()).rstrip(b"=").decode()
+        return item_id, item
+
+class NativeUploader:
+    """Uploads registrations straight to an Irys bundler node, skipping the Node helper"""
+
+    def __init__(self, client: UpstreamClient, signer: DataItemSigner, token: str):
+        self.client = client
+        self.signer = signer
+        self.token = token
+        self.uploads = 0
+        self.failures = 0
+        self.sign_latency = LatencyHistogram()
+
+    async def upload(self, upload_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Upload one registration; returns the same result shape as the helper's /upload"""
+        timestamp = upload_data.get("timestamp") or int(time.time() * 1000)
+        username, owner = upload_data["username"], upload_data["owner"]
+        anchor = upload_data["anchor"].encode() if upload_data.get("anchor") else None
+        payload = dumps_json({
+            "username": username,
+            "owner": owner,
+            "timestamp": timestamp,
+            "metadata": upload_data.get("metadata") or {},
+            "version": "1.0.0",
+        })
+        tags = [
+            ("Content-Type", "application/json"),
+            ("App-Name", "IrysUsername"),
+            ("Type", "username-registration"),
+            ("Username", username),
+            ("Owner", owner),
+            ("Timestamp", str(timestamp)),
+            ("Version", "1.0.0"),
+        ]
+        
+        started = time.perf_counter()
+        item_id, item = await asyncio.to_thread(self.signer.sign, payload, tags, anchor)
+        self.sign_latency.observe(time.perf_counter() - started)
+        
+        response = await self.client.post(
+            f"/tx/{self.token}",
+            content=item,
+            headers={"Content-Type": "application/octet-stream"},
+            timeout=30.0
+        )
+        if response.status_code not in (200, 201):
+            self.failures += 1
+            logger.error(f"Irys bundler error: {response.status_code} {response.text}")
+            return {"success": False, "error": f"Upload failed: {response.text}"}
+        
+        self.uploads += 1
+        receipt = loads_json(response.content) if response.content else {}
+        return {
+            "success": True,
+            "id": receipt.get("id", item_id),
+            "timestamp": receipt.get("timestamp", timestamp),
+            "username": username,
+            "owner": owner,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "bundler": str(self.client.client.base_url),
+            "address": self.signer.address,
+            "uploads": self.uploads,
+            "failures": self.failures,
+            "sign_latency": self.sign_latency.snapshot(),
+        }
+
+class UploadBatcher:
+    """Collects uploads over a short window and sends them to the helper's bulk endpoint"""
+
+    def __init__(self, client: UpstreamClient, window: float, max_items: int):
+        self.client = client
+        self.window = window
+        self.max_items = max_items
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._sends: set = set()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.failed_batches = 0
+
+    async def submit(self, upload_data: Dict[str, Any]) -> Dict[str, Any]:
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((upload_data, future))
+        return await future
+
+    async def _run(self):
+        # This task outlives the request that started it, so detach it from that request's timings
+        request_timings.set(None)
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_items:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Send in the background so the next batch can start collecting immediately
+            send = asyncio.create_task(self._send(batch))
+            self._sends.add(send)
+            send.add_done_callback(self._sends.discard)
+
+    async def _send(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            response = await self.client.post(
+                "/upload/batch",
+                json={"items": [upload_data for upload_data, _ in batch]},
+                headers={"Content-Type": "application/json"},
+                timeout=30.0 + len(batch)
+            )
+            if response.status_code == 200:
+                results = response.json().get("results", [])
+            else:
+                logger.error(f"Irys helper batch upload error: {response.text}")
+                results = [{"success": False, "error": f"Upload failed: {response.text}"}] * len(batch)
+        except Exception as error:
+            logger.error(f"Batch upload error: {error}")
+            results = [{"success": False, "error": str(error)}] * len(batch)
+        
+        if len(results) != len(batch) or not all(result.get("success") for result in results):
+            self.failed_batches += 1
+        for index, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(results[index] if index < len(results) else {"success": False, "error": "Missing upload result"})
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._sends:
+            await asyncio.gather(*self._sends, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_result({"success": False, "error": "Service shutting down"})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": UPLOAD_BATCHING_ENABLED,
+            "window": self.window,
+            "max_items": self.max_items,
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch": self.items / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "failed_batches": self.failed_batches,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+class FeedSubscription:
+    """One subscriber's bounded buffer of records not yet delivered"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.buffer: deque = deque()
+        self.ready = asyncio.Event()
+        self.overflowed = False
+        self.closed = False
+
+    def push(self, record: UsernameRecord) -> bool:
+        if len(self.buffer) >= self.max_size:
+            # The client is not keeping up; drop it rather than buffer without bound
+            self.overflowed = True
+            self.buffer.clear()
+            self.ready.set()
+            return False
+        self.buffer.append(record)
+        self.ready.set()
+        return True
+
+    async def next_batch(self, timeout: float) -> List[UsernameRecord]:
+        """Everything buffered so far, waiting up to timeout for at least one record"""
+        if not self.buffer and not self.overflowed and not self.closed:
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self.ready.clear()
+        batch = list(self.buffer)
+        self.buffer.clear()
+        return batch
+
+class RegistrationFeed:
+    """Fans newly seen registrations out from the registry to live subscribers"""
+
+    def __init__(self, buffer_size: int, max_subscribers: int):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: set = set()
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+
+    def subscribe(self) -> Optional[FeedSubscription]:
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscription = FeedSubscription(self.buffer_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: FeedSubscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, records: List[UsernameRecord]):
+        if not records:
+            return
+        self.published += len(records)
+        for subscription in list(self._subscribers):
+            for record in records:
+                if not subscription.push(record):
+                    self.overflows += 1
+                    self._subscribers.discard(subscription)
+                    break
+                self.delivered += 1
+
+    def close(self):
+        for subscription in self._subscribers:
+            subscription.closed = True
+            subscription.ready.set()
+        self._subscribers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "max_subscribers": self.max_subscribers,
+            "buffer_size": self.buffer_size,
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+        }
 
 class IrysService:
     def __init__(self):
         self.private_key = PRIVATE_KEY
         self.gateway_url = IRYS_GATEWAY_URL
         self.graphql_url = IRYS_GRAPHQL_URL
-        
-    def is_valid_username(self, username: str) -> bool:
-        """Validate username format: 3-20 characters, alphanumeric + underscore"""
-        import re
-        if not username or len(username) < 3 or len(username) > 20:
+        self.helper_url = IRYS_HELPER_URL
+        self.graphql_client = UpstreamClient("graphql", http2=HTTP2_ENABLED, max_in_flight=GRAPHQL_MAX_IN_FLIGHT)
+        self.helper_client = UpstreamClient("helper", base_url=self.helper_url, max_in_flight=HELPER_MAX_IN_FLIGHT)
+        self.bundler_client: Optional[UpstreamClient] = None
+        self.native_uploader: Optional[NativeUploader] = None
+        if IRYS_UPLOADER == "native":
+            self.bundler_client = UpstreamClient(
+                "bundler", base_url=IRYS_BUNDLER_URL, http2=HTTP2_ENABLED, max_in_flight=BUNDLER_MAX_IN_FLIGHT
+            )
+            self.native_uploader = NativeUploader(self.bundler_client, DataItemSigner(PRIVATE_KEY), IRYS_TOKEN)
+        self.graphql_hedge_url = IRYS_GRAPHQL_HEDGE_URL
+        self.graphql_hedge_client = (
+            UpstreamClient("graphql_hedge", http2=HTTP2_ENABLED, max_in_flight=GRAPHQL_MAX_IN_FLIGHT)
+            if self.graphql_hedge_url else None
+        )
+        self.graphql_breaker = CircuitBreaker("graphql", BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.stale_fallbacks = 0
+        self.username_cache = UsernameCache(
+            max_size=USERNAME_CACHE_SIZE,
+            positive_ttl=USERNAME_CACHE_POSITIVE_TTL,
+            negative_ttl=USERNAME_CACHE_NEGATIVE_TTL,
+        )
+        self.lookup_flight = SingleFlight()
+        self.registry = UsernameRegistry(
+            REGISTRY_DB_PATH, REGISTRY_SNAPSHOT_PATH or None, REGISTRY_SYNC_INTERVAL,
+            REGISTRY_BLOOM_CAPACITY, REGISTRY_BLOOM_ERROR_RATE, STATS_NEWEST,
+        )
+        self._summary: Optional[Tuple[Any, bytes, str]] = None
+        self.state_backend = create_state_backend(STATE_BACKEND, STATE_SQLITE_PATH, REDIS_URL, REDIS_POOL_SIZE)
+        # A queued registration's reservation has to last until an outbox worker claims the entry and renews it
+        reservation_ttl = max(RESERVATION_TTL, OUTBOX_LEASE) if OUTBOX_ENABLED else RESERVATION_TTL
+        self.reservations = ReservationTable(reservation_ttl, self.state_backend)
+        self.feed = RegistrationFeed(FEED_BUFFER_SIZE, FEED_MAX_SUBSCRIBERS)
+        self.outbox: Optional[RegistrationOutbox] = None
+        if OUTBOX_ENABLED:
+            self.outbox = RegistrationOutbox(
+                OUTBOX_DB_PATH, OUTBOX_WORKERS, OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE, OUTBOX_RETRY_MAX,
+                OUTBOX_LEASE, OUTBOX_POLL_INTERVAL, OUTBOX_RETENTION, reservations=self.reservations,
+            )
+        self.upload_batcher = UploadBatcher(self.helper_client, UPLOAD_BATCH_WINDOW, UPLOAD_BATCH_MAX_ITEMS)
+        self._sync_task: Optional[asyncio.Task] = None
+        self.worker_id = uuid.uuid4().hex
+        self.registry_leader = False
+        self._aggregates_task: Optional[asyncio.Task] = None
+        self._index_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Warm up the shared upstream clients"""
+        self.graphql_client.client
+        self.helper_client.client
+        logger.info(f"Upstream pools ready (http2={self.graphql_client.http2}, max_connections={HTTP_MAX_CONNECTIONS})")
+        if self.native_uploader is not None:
+            # Load the secp256k1 backend and start the worker thread before the first registration needs them
+            await asyncio.to_thread(self.native_uploader.signer.sign, b"", [])
+            logger.info(f"Native Irys uploader ready (bundler={IRYS_BUNDLER_URL}, address={self.native_uploader.signer.address})")
+        if WORKERS > 1 and not self.state_backend.shared:
+            logger.warning("Running several workers with STATE_BACKEND=memory: reservations are not shared between them")
+        if REGISTRY_SYNC_ENABLED:
+            self.registry.open()
+            self._sync_task = asyncio.create_task(self._sync_loop())
+        self.build_aggregates()
+        self.build_index()
+        if self.outbox is not None:
+            await self.outbox.start(self.deliver_registration)
+
+    async def close(self):
+        """Close the shared upstream clients"""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        if self.outbox is not None:
+            await self.outbox.close()
+        self.feed.close()
+        # The build threads read the mapped snapshot, which closing the registry unmaps
+        builds = [task for task in (self._aggregates_task, self._index_task) if task is not None]
+        await asyncio.gather(*builds, return_exceptions=True)
+        if self.registry_leader:
+            if self.registry.changes_since_snapshot:
+                await self.save_snapshot()
+            # Hand over straight away rather than when the lease runs out
+            if await self.state_backend.get(REGISTRY_LEADER_KEY) == self.worker_id:
+                await self.state_backend.delete(REGISTRY_LEADER_KEY)
+            self.registry_leader = False
+        self.registry.close()
+        await self.upload_batcher.close()
+        await self.state_backend.close()
+        await self.graphql_client.close()
+        if self.graphql_hedge_client is not None:
+            await self.graphql_hedge_client.close()
+        await self.helper_client.close()
+        if self.bundler_client is not None:
+            await self.bundler_client.close()
+
+    async def _sync_loop(self):
+        """Keep the local registry caught up: the leader syncs from Irys, every worker reads back the shared database"""
+        while True:
+            try:
+                await self.refresh_registry()
+                
+                leader = await self.claim_registry_leadership()
+                if leader != self.registry_leader:
+                    logger.info(f"Worker {self.worker_id} {'took' if leader else 'lost'} the registry sync lease")
+                    self.registry_leader = leader
+                if leader:
+                    await self.sync_registry()
+                    last_snapshot = self.registry.last_snapshot
+                    if self.registry.changes_since_snapshot and (
+                        last_snapshot is None or time.time() - last_snapshot >= REGISTRY_SNAPSHOT_INTERVAL
+                    ):
+                        await self.save_snapshot()
+                if self.registry.aggregates is not None and self.registry.aggregates.stale:
+                    self.build_aggregates()
+                if self.registry.index is None:
+                    # The startup build failed; build_index does nothing while one is still running
+                    self.build_index()
+            except Exception as error:
+                logger.error(f"Registry sync error: {error}")
+            await asyncio.sleep(REGISTRY_SYNC_INTERVAL)
+    
+    async def refresh_registry(self):
+        """Pick up the rows other workers have written to the shared registry database"""
+        added = await self.registry.refresh()
+        for record in added:
+            self.username_cache.invalidate(record.username)
+        self.feed.publish(added)
+    
+    async def claim_registry_leadership(self) -> bool:
+        """Take or renew the registry sync lease; False while another worker holds it"""
+        holder = await self.state_backend.get(REGISTRY_LEADER_KEY)
+        if holder == self.worker_id:
+            await self.state_backend.set(REGISTRY_LEADER_KEY, self.worker_id, REGISTRY_LEADER_LEASE)
+            return True
+        if holder is not None:
             return False
-        return re.match(r'^[a-zA-Z0-9_]+$', username) is not None
+        return await self.state_backend.set(
+            REGISTRY_LEADER_KEY, self.worker_id, REGISTRY_LEADER_LEASE, only_if_absent=True
+        )
     
-    async def upload_username_to_irys(self, username: str, owner_address: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Upload username data to Irys using Node.js helper service"""
+    def build_aggregates(self) -> asyncio.Task:
+        """Build the /api/stats aggregates in a worker thread, one build at a time; _set maintains them afterwards"""
+        if self._aggregates_task is None or self._aggregates_task.done():
+            self._aggregates_task = asyncio.create_task(self._build_aggregates())
+        return self._aggregates_task
+    
+    async def _build_aggregates(self):
+        started = time.perf_counter()
+        try:
+            aggregates = await asyncio.to_thread(UsernameRegistry.build_aggregates, self.registry.aggregates_source())
+        except Exception as error:
+            self.registry.aggregate_log = None
+            logger.error(f"Registry aggregates error: {error}")
+            raise
+        self.registry.install_aggregates(aggregates)
+        logger.info(f"Built registry aggregates over {aggregates.total} usernames in {(time.perf_counter() - started) * 1000:.0f}ms")
+    
+    def build_index(self) -> asyncio.Task:
+        """Build the search index in a worker thread; _set keeps it up to date afterwards"""
+        if self._index_task is None or self._index_task.done():
+            self._index_task = asyncio.create_task(self._build_index())
+        return self._index_task
+    
+    async def _build_index(self):
+        started = time.perf_counter()
+        try:
+            index = await asyncio.to_thread(UsernameRegistry.build_index, self.registry.index_source())
+        except Exception as error:
+            self.registry.index_log = None
+            logger.error(f"Registry search index error: {error}")
+            raise
+        self.registry.install_index(index)
+        logger.info(f"Built registry search index over {len(index.names)} usernames in {(time.perf_counter() - started) * 1000:.0f}ms")
+    
+    async def registry_summary(self) -> Tuple[bytes, str]:
+        """Serialized /api/stats document and its ETag, rebuilt only after the registry changes.
+        
+        Waits only for the first aggregates build; stale aggregates are served while they are redone.
+        """
+        aggregates = self.registry.aggregates
+        if aggregates is None or aggregates.stale:
+            task = self.build_aggregates()
+            if aggregates is None:
+                await asyncio.shield(task)
+                aggregates = self.registry.aggregates
+        key = (id(aggregates), aggregates.version, self.registry.is_current())
+        if self._summary is None or self._summary[0] != key:
+            body = dumps_json({
+                "total": aggregates.total,
+                "owners": len(aggregates.owner_counts),
+                "per_day": [{"date": day, "count": count} for day, count in aggregates.days(STATS_MAX_DAYS)],
+                "top_owners": [{"owner": owner, "count": count} for owner, count in aggregates.top_owners(STATS_TOP_OWNERS)],
+                "newest": aggregates.newest(),
+                "synced": key[2],
+            })
+            self._summary = (key, body, f'"{hashlib.sha1(body).hexdigest()}"')
+        return self._summary[1], self._summary[2]
+    
+    async def save_snapshot(self):
+        """Write the registry snapshot in a worker thread; the next start maps it instead of replaying SQLite"""
+        if not self.registry.snapshot_path or not self.registry.synced:
+            return
+        # Read back the latest rows first so that as few as possible are left to replay after the snapshot
+        await self.refresh_registry()
+        changes = self.registry.changes_since_snapshot
+        state = self.registry.snapshot_state()
+        try:
+            started = time.perf_counter()
+            count = await asyncio.to_thread(UsernameRegistry.write_snapshot, self.registry.snapshot_path, state)
+            self.registry.changes_since_snapshot -= changes
+            self.registry.last_snapshot = time.time()
+            logger.info(f"Wrote registry snapshot of {count} usernames in {(time.perf_counter() - started) * 1000:.0f}ms")
+        except Exception as error:
+            logger.error(f"Registry snapshot error: {error}")
+
+    async def _query_registrations_page(self, first: int, after: Optional[str]) -> Tuple[List[UsernameRecord], Optional[str], bool]:
+        """Fetch one page of registrations in ascending order. Returns (records, last cursor, has next page)."""
+        query = """
+        query($first: Int!, $after: String) {
+            transactions(
+                tags: [
+                    { name: "App-Name", values: ["IrysUsername"] },
+                    { name: "Type", values: ["username-registration"] }
+                ],
+                first: $first,
+                after: $after,
+                order: ASC
+            ) {
+                pageInfo {
+                    hasNextPage
+                }
+                edges {
+                    cursor
+                    node {
+                        id
+                        tags {
+                            name
+                            value
+                        }
+                    }
+                }
+            }
+        }
+        """
+        
+        data = await self._graphql(query, {"first": first, "after": after})
+        
+        transactions = data.get("transactions", {})
+        edges = transactions.get("edges", [])
+        if not edges:
+            return [], after, False
+        # Malformed nodes are dropped here, but the cursor still moves past them
+        records = [record for record in (record_from_node(edge["node"]) for edge in edges) if record is not None]
+        return records, edges[-1]["cursor"], bool(transactions.get("pageInfo", {}).get("hasNextPage"))
+
+    async def sync_registry(self) -> int:
+        """Page through registrations after the stored cursor and apply them to the local registry"""
+        synced = 0
+        while True:
+            records, cursor, has_next = await self._query_registrations_page(REGISTRY_PAGE_SIZE, self.registry.cursor)
+            if cursor != self.registry.cursor:
+                added = await self.registry.apply(records, cursor=cursor)
+                for record in added:
+                    self.username_cache.invalidate(record.username)
+                self.feed.publish(added)
+                synced += len(records)
+            
+            if not has_next:
+                break
+            if self.registry_leader and not await self.claim_registry_leadership():
+                # A long catch-up outlived the lease and another worker carries on from the stored cursor
+                self.registry_leader = False
+                return synced
+        
+        if synced:
+            logger.info(f"Registry sync applied {synced} transactions ({len(self.registry)} usernames)")
+        await self.registry.mark_synced()
+        return synced
+
+    def pool_stats(self) -> Dict[str, Any]:
+        stats = {
+            "graphql": self.graphql_client.stats(),
+            "helper": self.helper_client.stats(),
+        }
+        if self.graphql_hedge_client is not None:
+            stats["graphql_hedge"] = self.graphql_hedge_client.stats()
+        if self.bundler_client is not None:
+            stats["bundler"] = self.bundler_client.stats()
+        return stats
+
+    def upstream_health(self) -> Dict[str, Any]:
+        return {
+            "graphql_breaker": self.graphql_breaker.stats(),
+            "hedging": {
+                "enabled": self.graphql_hedge_client is not None,
+                "delay": GRAPHQL_HEDGE_DELAY,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+            },
+            "stale_fallbacks": self.stale_fallbacks,
+            "request_deadline": REQUEST_DEADLINE,
+        }
+
+    async def _graphql(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a GraphQL query within the request deadline, behind the circuit breaker. Returns the data object."""
+        timeout = deadline_timeout(GRAPHQL_TIMEOUT)
+        # When the caller's remaining budget, not GRAPHQL_TIMEOUT, sets the timeout, running out of it
+        # says nothing about the upstream and must not count against the shared breaker
+        caller_bound = timeout < GRAPHQL_TIMEOUT
+        self.graphql_client.check_capacity()
+        self.graphql_breaker.before_call()
+        payload = {"query": query, "variables": variables}
+        try:
+            response = await asyncio.wait_for(self._graphql_post(payload, timeout), timeout)
+        except UpstreamSaturatedError:
+            # Turned away locally; says nothing about the upstream's health
+            self.graphql_breaker.cancel_call()
+            raise
+        except (asyncio.TimeoutError, httpx.TimeoutException) as error:
+            if caller_bound:
+                self.graphql_breaker.cancel_call()
+            else:
+                self.graphql_breaker.record_failure()
+            raise DeadlineExceededError(f"GraphQL request timed out after {timeout:.2f}s") from error
+        except Exception as error:
+            self.graphql_breaker.record_failure()
+            raise UpstreamUnavailableError(f"GraphQL request failed: {error!r}") from error
+        
+        if response.status_code != 200:
+            if response.status_code >= 500 or response.status_code == 429:
+                self.graphql_breaker.record_failure()
+            else:
+                self.graphql_breaker.record_success()
+            raise UpstreamUnavailableError(f"GraphQL query failed with status {response.status_code}")
+        
+        self.graphql_breaker.record_success()
+        return loads_json(response.content).get("data", {})
+
+    async def _graphql_post(self, payload: Dict[str, Any], timeout: float) -> httpx.Response:
+        """POST to the primary endpoint; if it is slow, race a hedged request to the secondary"""
+        primary = asyncio.ensure_future(self.graphql_client.post(
+            self.graphql_url,
+            json=payload,
+            headers={"Content-Type": "application/json"},
+            timeout=timeout
+        ))
+        if self.graphql_hedge_client is None or timeout <= GRAPHQL_HEDGE_DELAY:
+            return await primary
+        
+        done, _ = await asyncio.wait({primary}, timeout=GRAPHQL_HEDGE_DELAY)
+        if done:
+            return primary.result()
+        
+        self.hedges += 1
+        hedge = asyncio.ensure_future(self.graphql_hedge_client.post(
+            self.graphql_hedge_url,
+            json=payload,
+            headers={"Content-Type": "application/json"},
+            timeout=timeout - GRAPHQL_HEDGE_DELAY
+        ))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code == 200:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Neither answered successfully: surface the primary's outcome
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        
+    async def upload_username_to_irys(self, username: str, owner_address: str, metadata: Dict[str, Any] = None,
+                                      timestamp: Optional[int] = None, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """Upload username data to Irys, natively or through the Node.js helper service
+        
+        With a fixed timestamp and idempotency key (used as the data item anchor) a retried upload
+        produces the same signed data item, so the bundler treats it as a duplicate, not a new registration.
+        """
         try:
             normalized_username = username.lower()
             normalized_owner = owner_address.lower()
@@ -83,296 +1130,923 @@ class IrysService:
                 "owner": normalized_owner,
                 "metadata": metadata or {}
             }
+            if timestamp is not None:
+                upload_data["timestamp"] = timestamp
+            if idempotency_key is not None:
+                upload_data["anchor"] = idempotency_key
             
-            logger.info(f"Uploading username '{username}' to Irys via helper service")
+            logger.info(f"Uploading username '{username}' to Irys via {IRYS_UPLOADER} uploader")
             
-            # Call the Node.js helper service
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "http://localhost:3002/upload",
-                    json=upload_data,
-                    headers={"Content-Type": "application/json"},
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    logger.info(f"Successfully uploaded username '{username}' with tx ID: {result['id']}")
-                    return result
-                else:
-                    error_detail = response.text
-                    logger.error(f"Irys helper service error: {error_detail}")
-                    return {"success": False, "error": f"Upload failed: {error_detail}"}
+            if self.native_uploader is not None:
+                result = await self.native_uploader.upload(upload_data)
+            elif UPLOAD_BATCHING_ENABLED:
+                result = await self.upload_batcher.submit(upload_data)
+            else:
+                result = await self._upload_single(upload_data)
+            
+            if result.get("success"):
+                logger.info(f"Successfully uploaded username '{username}' with tx ID: {result['id']}")
+            return result
             
+        except UpstreamSaturatedError:
+            raise
         except Exception as error:
             logger.error(f"Upload error: {error}")
             return {"success": False, "error": str(error)}
     
-    async def check_username_availability(self, username: str) -> bool:
-        """Check if username is available using GraphQL query"""
-        try:
-            normalized_username = username.lower()
-            
-            # Use real GraphQL query to Irys
-            query = """
-            query($username: String!) {
-                transactions(
-                    tags: [
-                        { name: "App-Name", values: ["IrysUsername"] },
-                        { name: "Type", values: ["username-registration"] },
-                        { name: "Username", values: [$username] }
-                    ],
-                    first: 1
-                ) {
-                    edges {
-                        node { 
-                            id 
-                            tags {
-                                name
-                                value
-                            }
+    async def _upload_single(self, upload_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Upload one registration through the helper's /upload endpoint"""
+        response = await self.helper_client.post(
+            "/upload",
+            json=upload_data,
+            headers={"Content-Type": "application/json"},
+            timeout=30.0
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            error_detail = response.text
+            logger.error(f"Irys helper service error: {error_detail}")
+            return {"success": False, "error": f"Upload failed: {error_detail}"}
+    
+    async def _query_username(self, normalized_username: str) -> Optional[UsernameRecord]:
+        """Look up a single username registration via GraphQL. Raises on upstream failure."""
+        query = """
+        query($username: String!) {
+            transactions(
+                tags: [
+                    { name: "App-Name", values: ["IrysUsername"] },
+                    { name: "Type", values: ["username-registration"] },
+                    { name: "Username", values: [$username] }
+                ],
+                first: 10
+            ) {
+                edges {
+                    node {
+                        id
+                        tags {
+                            name
+                            value
                         }
                     }
                 }
             }
-            """
-            
-            # Make GraphQL request to Irys
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.graphql_url,
-                    json={
-                        "query": query,
-                        "variables": {"username": normalized_username}
-                    },
-                    headers={"Content-Type": "application/json"},
-                    timeout=10.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    edges = result.get("data", {}).get("transactions", {}).get("edges", [])
-                    available = len(edges) == 0
-                    logger.info(f"Username '{username}' availability check: {available}")
-                    return available
-                else:
-                    logger.error(f"GraphQL query failed with status {response.status_code}")
-                    return True  # Default to available if query fails
-            
+        }
+        """
+        
+        data = await self._graphql(query, {"username": normalized_username})
+        
+        # A few candidates, so that a malformed upload for the name cannot hide the real registration
+        edges = data.get("transactions", {}).get("edges", [])
+        records = [record for record in (record_from_node(edge["node"], normalized_username) for edge in edges) if record is not None]
+        return min(records, key=lambda record: record.timestamp) if records else None
+    
+    async def lookup_username(self, normalized_username: str) -> Optional[UsernameRecord]:
+        """Cached username lookup shared by resolve and availability checks"""
+        record = self.registry.get(normalized_username)
+        if record is not None:
+            return record
+        
+        cached = self.username_cache.get(normalized_username)
+        if cached is not UsernameCache.MISS:
+            return cached
+        
+        # Other workers may have registered the name before our registry has synced it
+        shared = await self._shared_cache_get(normalized_username)
+        if shared is not UsernameCache.MISS:
+            self.username_cache.put(normalized_username, shared)
+            return shared
+        
+        if self.registry.is_current():
+            return None
+        
+        try:
+            return await self.lookup_flight.do(
+                normalized_username,
+                lambda: self._fetch_and_cache(normalized_username)
+            )
+        except UpstreamUnavailableError:
+            stale = self.username_cache.get_stale(normalized_username)
+            if stale is UsernameCache.MISS:
+                raise
+            self.stale_fallbacks += 1
+            return stale
+    
+    async def _fetch_and_cache(self, normalized_username: str) -> Optional[UsernameRecord]:
+        record = await self._query_username(normalized_username)
+        self.username_cache.put(normalized_username, record)
+        await self._shared_cache_put(normalized_username, record)
+        return record
+    
+    async def _shared_cache_get(self, normalized_username: str):
+        """Lookup result cached in the shared state backend, or UsernameCache.MISS"""
+        if not self.state_backend.shared:
+            return UsernameCache.MISS
+        try:
+            value = await self.state_backend.get(f"username:{normalized_username}")
         except Exception as error:
-            logger.error(f"Availability check error: {error}")
-            # For demo purposes, return True if there's an error
-            return True
+            logger.error(f"Shared cache read error: {error}")
+            return UsernameCache.MISS
+        if value is None:
+            return UsernameCache.MISS
+        data = loads_json(value)
+        return UsernameRecord(**data) if data else None
     
-    async def resolve_username(self, username: str) -> Optional[UsernameRecord]:
-        """Resolve username to owner record"""
+    async def _shared_cache_put(self, normalized_username: str, record: Optional[UsernameRecord]):
+        if not self.state_backend.shared:
+            return
+        ttl = USERNAME_CACHE_POSITIVE_TTL if record is not None else USERNAME_CACHE_NEGATIVE_TTL
         try:
-            normalized_username = username.lower()
-            
-            # Use real GraphQL query to Irys
-            query = """
-            query($username: String!) {
-                transactions(
-                    tags: [
-                        { name: "App-Name", values: ["IrysUsername"] },
-                        { name: "Type", values: ["username-registration"] },
-                        { name: "Username", values: [$username] }
-                    ],
-                    first: 1
-                ) {
-                    edges {
-                        node {
-                            id
-                            tags {
-                                name
-                                value
-                            }
+            await self.state_backend.set(
+                f"username:{normalized_username}",
+                dumps_json(record).decode(),
+                ttl
+            )
+        except Exception as error:
+            logger.error(f"Shared cache write error: {error}")
+    
+    async def _query_usernames(self, normalized_usernames: List[str]) -> Dict[str, UsernameRecord]:
+        """Look up many username registrations with one multi-value tag query per page. Raises on upstream failure."""
+        query = """
+        query($usernames: [String!]!, $first: Int!, $after: String) {
+            transactions(
+                tags: [
+                    { name: "App-Name", values: ["IrysUsername"] },
+                    { name: "Type", values: ["username-registration"] },
+                    { name: "Username", values: $usernames }
+                ],
+                first: $first,
+                after: $after,
+                order: ASC
+            ) {
+                pageInfo {
+                    hasNextPage
+                }
+                edges {
+                    cursor
+                    node {
+                        id
+                        tags {
+                            name
+                            value
                         }
                     }
                 }
             }
-            """
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.graphql_url,
-                    json={
-                        "query": query,
-                        "variables": {"username": normalized_username}
-                    },
-                    headers={"Content-Type": "application/json"},
-                    timeout=10.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    edges = result.get("data", {}).get("transactions", {}).get("edges", [])
-                    
-                    if edges:
-                        node = edges[0]["node"]
-                        tags = {tag["name"]: tag["value"] for tag in node["tags"]}
-                        
-                        return UsernameRecord(
-                            id=node["id"],
-                            username=tags.get("Username", normalized_username),
-                            owner=tags.get("Owner", ""),
-                            timestamp=int(tags.get("Timestamp", 0))
-                        )
-            
-            return None
+        }
+        """
+        
+        found: Dict[str, UsernameRecord] = {}
+        after = None
+        while True:
+            data = await self._graphql(query, {"usernames": normalized_usernames, "first": len(normalized_usernames), "after": after})
             
-        except Exception as error:
-            logger.error(f"Resolve username error: {error}")
-            return None
+            transactions = data.get("transactions", {})
+            edges = transactions.get("edges", [])
+            for edge in edges:
+                record = record_from_node(edge["node"])
+                if record is None:
+                    continue
+                existing = found.get(record.username)
+                if existing is None or record.timestamp < existing.timestamp:
+                    found[record.username] = record
             
-    async def get_all_usernames(self, limit: int = 100) -> List[UsernameRecord]:
-        """Get all registered usernames for leaderboard"""
-        try:
-            # Use real GraphQL query to Irys
-            query = """
-            query($limit: Int!) {
-                transactions(
-                    tags: [
-                        { name: "App-Name", values: ["IrysUsername"] },
-                        { name: "Type", values: ["username-registration"] }
-                    ],
-                    first: $limit
-                ) {
-                    edges {
-                        node {
-                            id
-                            tags {
-                                name
-                                value
-                            }
+            if not edges or not transactions.get("pageInfo", {}).get("hasNextPage"):
+                return found
+            after = edges[-1]["cursor"]
+    
+    async def lookup_usernames(self, normalized_usernames: List[str]) -> Dict[str, Any]:
+        """Batch lookup: answers from the registry and cache, then a few GraphQL queries for the rest.
+        
+        Returns a mapping of username to a UsernameRecord, None (not registered) or an Exception.
+        """
+        results: Dict[str, Any] = {}
+        missing = []
+        registry_current = self.registry.is_current()
+        for username in dict.fromkeys(normalized_usernames):
+            record = self.registry.get(username)
+            if record is not None or registry_current:
+                results[username] = record
+                continue
+            cached = self.username_cache.get(username)
+            if cached is not UsernameCache.MISS:
+                results[username] = cached
+            else:
+                missing.append(username)
+        
+        chunks = [missing[i:i + BATCH_QUERY_CHUNK] for i in range(0, len(missing), BATCH_QUERY_CHUNK)]
+        responses = await asyncio.gather(*[self._query_usernames(chunk) for chunk in chunks], return_exceptions=True)
+        for chunk, found in zip(chunks, responses):
+            for username in chunk:
+                if isinstance(found, Exception):
+                    results[username] = found
+                else:
+                    results[username] = found.get(username)
+                    self.username_cache.put(username, results[username])
+        return results
+    
+    async def _query_owner_usernames(self, normalized_owners: List[str]) -> List[str]:
+        """Find usernames tagged with any of the given owners. Raises on upstream failure."""
+        query = """
+        query($owners: [String!]!, $first: Int!, $after: String) {
+            transactions(
+                tags: [
+                    { name: "App-Name", values: ["IrysUsername"] },
+                    { name: "Type", values: ["username-registration"] },
+                    { name: "Owner", values: $owners }
+                ],
+                first: $first,
+                after: $after,
+                order: ASC
+            ) {
+                pageInfo {
+                    hasNextPage
+                }
+                edges {
+                    cursor
+                    node {
+                        id
+                        tags {
+                            name
+                            value
                         }
                     }
                 }
             }
-            """
+        }
+        """
+        
+        usernames: List[str] = []
+        after = None
+        while True:
+            data = await self._graphql(query, {"owners": normalized_owners, "first": REGISTRY_PAGE_SIZE, "after": after})
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.graphql_url,
-                    json={
-                        "query": query,
-                        "variables": {"limit": limit}
-                    },
-                    headers={"Content-Type": "application/json"},
-                    timeout=10.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    edges = result.get("data", {}).get("transactions", {}).get("edges", [])
-                    
-                    usernames = []
-                    for edge in edges:
-                        node = edge["node"]
-                        tags = {tag["name"]: tag["value"] for tag in node["tags"]}
-                        
-                        usernames.append(UsernameRecord(
-                            id=node["id"],
-                            username=tags.get("Username", ""),
-                            owner=tags.get("Owner", ""),
-                            timestamp=int(tags.get("Timestamp", 0))
-                        ))
-                    
-                    return usernames
-                else:
-                    logger.error(f"GraphQL query failed with status {response.status_code}")
-                    return []
+            transactions = data.get("transactions", {})
+            edges = transactions.get("edges", [])
+            records = (record_from_node(edge["node"]) for edge in edges)
+            usernames.extend(record.username for record in records if record is not None)
             
+            if not edges or not transactions.get("pageInfo", {}).get("hasNextPage"):
+                return list(dict.fromkeys(usernames))
+            after = edges[-1]["cursor"]
+    
+    async def reverse_lookup(self, normalized_owners: List[str]) -> Dict[str, List[str]]:
+        """Map owner addresses (lowercase) to the usernames they currently own"""
+        if not normalized_owners:
+            return {}
+        if self.registry.is_current():
+            return {owner: self.registry.names_for_owner(owner) for owner in normalized_owners}
+        
+        # Without a current registry, find tagged names upstream and keep only those the owner actually holds
+        candidates = await self._query_owner_usernames(normalized_owners)
+        records = await self.lookup_usernames(candidates)
+        owned: Dict[str, List[str]] = {owner: [] for owner in normalized_owners}
+        for username in candidates:
+            record = records.get(username)
+            if isinstance(record, UsernameRecord) and record.owner.lower() in owned:
+                owned[record.owner.lower()].append(username)
+        return owned
+    
+    async def on_registered(self, record: UsernameRecord):
+        """Apply a successful registration to local state and publish it to the other workers"""
+        self.username_cache.invalidate(record.username)
+        self.username_cache.put(record.username, record)
+        self.feed.publish(await self.registry.apply([record]))
+        await self._shared_cache_put(record.username, record)
+    
+    async def deliver_registration(self, entry: OutboxEntry) -> Dict[str, Any]:
+        """Upload one outbox entry and apply it locally once it has landed"""
+        if entry.attempts > 1:
+            # An earlier attempt may have reached Irys before failing or before the process died
+            record = await self.lookup_username(entry.username)
+            if record is not None:
+                if record.owner != entry.owner:
+                    return {"success": False, "retry": False, "error": "Username is already taken"}
+                return {"success": True, "id": record.id}
+        
+        result = await self.upload_username_to_irys(
+            entry.username, entry.owner, entry.metadata,
+            timestamp=entry.timestamp, idempotency_key=entry.ticket
+        )
+        if result.get("success"):
+            await self.on_registered(UsernameRecord(
+                id=result["id"],
+                username=entry.username,
+                owner=entry.owner,
+                timestamp=int(result.get("timestamp") or entry.timestamp)
+            ))
+        return result
+    
+    async def pending_registration(self, normalized_username: str) -> bool:
+        """Whether the name is waiting in the outbox to be uploaded"""
+        return self.outbox is not None and await self.outbox.holder(normalized_username) is not None
+    
+    async def check_username_availability(self, username: str) -> bool:
+        """Check if username is available. Raises UpstreamUnavailableError if that cannot be determined."""
+        if await self.pending_registration(username.lower()) or await self.reservations.holder(username.lower()) is not None:
+            logger.info(f"Username '{username}' availability check: False (registration pending)")
+            return False
+        
+        record = await self.lookup_username(username.lower())
+        available = record is None
+        logger.info(f"Username '{username}' availability check: {available}")
+        return available
+    
+    async def check_usernames_availability(self, normalized_usernames: List[str]) -> Dict[str, Any]:
+        """Batch availability check with the same pending-registration rule as check_username_availability.
+        
+        Returns a mapping of username to True (available), False (taken or pending) or an Exception.
+        """
+        names = list(dict.fromkeys(normalized_usernames))
+        pending = await self.outbox.open_usernames(names) if self.outbox is not None else set()
+        unheld = [username for username in names if username not in pending]
+        holders = await asyncio.gather(*[self.reservations.holder(username) for username in unheld])
+        pending.update(username for username, holder in zip(unheld, holders) if holder is not None)
+        
+        records = await self.lookup_usernames([username for username in names if username not in pending])
+        results: Dict[str, Any] = {username: False for username in pending}
+        for username, record in records.items():
+            results[username] = record if isinstance(record, Exception) else record is None
+        return results
+    
+    def suggest_alternatives(self, username: str, count: int = SUGGESTION_COUNT) -> List[str]:
+        """Unregistered variants of a taken name; empty unless the registry is current enough to vouch for them"""
+        if not self.registry.is_current():
+            return []
+        base = username.lower()
+        candidates = [f"{base}{digit}" for digit in range(1, 10)]
+        candidates += [f"{base}_", f"_{base}"]
+        candidates += [f"{base}{digit}{digit}" for digit in range(1, 10)]
+        suggestions = []
+        for candidate in candidates:
+            if is_valid_username(candidate) and self.registry.get(candidate) is None:
+                suggestions.append(candidate)
+                if len(suggestions) >= count:
+                    break
+        return suggestions
+    
+    async def resolve_username(self, username: str) -> Optional[UsernameRecord]:
+        """Resolve username to owner record. Raises UpstreamUnavailableError if that cannot be determined."""
+        return await self.lookup_username(username.lower())
+            
+    async def get_all_usernames(self, limit: int = 100, after: Optional[str] = None) -> Tuple[List[UsernameRecord], Optional[str]]:
+        """Get one page of registered usernames for leaderboard. Returns (usernames, next cursor)."""
+        try:
+            offset = local_cursor_offset(after)
+            if self.registry.is_current() and offset is not None:
+                usernames = self.registry.page(offset, limit)
+                next_offset = offset + len(usernames)
+                has_next = next_offset < len(self.registry)
+                return usernames, f"{LOCAL_CURSOR_PREFIX}{next_offset}" if has_next else None
+            
+            if after is not None and after.startswith(LOCAL_CURSOR_PREFIX):
+                # A local cursor is only meaningful while the registry is current
+                return [], None
+            
+            usernames, cursor, has_next = await self._query_registrations_page(limit, after)
+            return usernames, cursor if has_next else None
+            
+        except UpstreamUnavailableError:
+            raise
         except Exception as error:
             logger.error(f"Get all usernames error: {error}")
-            return []
+            return [], None
+    
+    async def iter_usernames(self, after: Optional[str] = None, limit: Optional[int] = None):
+        """Yield pages of registered usernames until the registry is exhausted or limit is reached
+        
+        A streamed export can outlive any single request budget, so each upstream page gets a fresh one.
+        """
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page_size = REGISTRY_PAGE_SIZE if remaining is None else min(REGISTRY_PAGE_SIZE, remaining)
+            offset = local_cursor_offset(after)
+            if self.registry.is_current() and offset is not None:
+                usernames = self.registry.page(offset, page_size)
+                after = f"{LOCAL_CURSOR_PREFIX}{offset + len(usernames)}"
+                has_next = offset + len(usernames) < len(self.registry)
+            elif after is not None and after.startswith(LOCAL_CURSOR_PREFIX):
+                # The registry fell behind mid-stream; GraphQL cannot resume from a local offset
+                raise RuntimeError("Local registry is no longer current, restart the export")
+            else:
+                token = request_deadline.set(time.monotonic() + REQUEST_DEADLINE)
+                try:
+                    usernames, after, has_next = await self._query_registrations_page(page_size, after)
+                finally:
+                    request_deadline.reset(token)
+            
+            if usernames:
+                yield usernames
+            if remaining is not None:
+                remaining -= len(usernames)
+            # A page can come back empty when all of its nodes were malformed; the cursor still moved on
+            if not has_next:
+                return
 
 # Initialize Irys service
 irys_service = IrysService()
 
-def verify_signature(message: str, signature: str, expected_address: str) -> bool:
-    """Verify Ethereum signature"""
+def recover_signer(message: str, signature: str) -> Optional[str]:
+    """Recover the lowercase signer address of a personal_sign message, or None if the signature is invalid"""
     try:
         # Create message hash
         message_hash = encode_defunct(text=message)
         
         # Recover address from signature
-        recovered_address = Account.recover_message(message_hash, signature=signature)
-        
-        # Compare addresses (case-insensitive)
-        return recovered_address.lower() == expected_address.lower()
+        return Account.recover_message(message_hash, signature=signature).lower()
         
     except Exception as error:
         logger.error(f"Signature verification error: {error}")
+        return None
+
+def verify_signature(message: str, signature: str, expected_address: str) -> bool:
+    """Verify Ethereum signature"""
+    recovered_address = recover_signer(message, signature)
+    
+    # Compare addresses (case-insensitive)
+    return recovered_address is not None and recovered_address == expected_address.lower()
+
+class SignatureVerifier:
+    """Runs signature recovery on a bounded worker pool and caches recovered signers"""
+
+    def __init__(self, workers: int, executor_kind: str, cache_size: int):
+        self.workers = workers
+        self.executor_kind = executor_kind
+        self.cache_size = cache_size
+        self._executor: Optional[Executor] = None
+        self._cache: "OrderedDict[Tuple[str, str], Optional[str]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.latency = LatencyHistogram()
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sigverify")
+        return self._executor
+
+    async def recover(self, message: str, signature: str) -> Optional[str]:
+        key = (message, signature)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return self._cache[key]
+        
+        self.cache_misses += 1
+        started = time.perf_counter()
+        recovered = await asyncio.get_running_loop().run_in_executor(self.executor, recover_signer, message, signature)
+        self.latency.observe(time.perf_counter() - started)
+        
+        self._cache[key] = recovered
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return recovered
+
+    async def verify(self, message: str, signature: str, expected_address: str) -> bool:
+        recovered = await self.recover(message, signature)
+        return recovered is not None and recovered == expected_address.lower()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "cache_size": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "latency": self.latency.snapshot(),
+        }
+
+class StageStats:
+    """Per-stage latency histograms and pass/reject counters for a request pipeline"""
+
+    def __init__(self, stages: List[str]):
+        self.stages = {
+            name: {"latency": LatencyHistogram(), "passed": 0, "rejected": 0, "errors": 0}
+            for name in stages
+        }
+
+    @contextmanager
+    def stage(self, name: str):
+        stats = self.stages[name]
+        started = time.perf_counter()
+        try:
+            yield
+        except HTTPException:
+            stats["rejected"] += 1
+            raise
+        except Exception:
+            stats["errors"] += 1
+            raise
+        else:
+            stats["passed"] += 1
+        finally:
+            elapsed = time.perf_counter() - started
+            stats["latency"].observe(elapsed)
+            record_timing(name, elapsed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "passed": stats["passed"],
+                "rejected": stats["rejected"],
+                "errors": stats["errors"],
+                "latency": stats["latency"].snapshot(),
+            }
+            for name, stats in self.stages.items()
+        }
+
+registration_stages = StageStats(["format", "signature", "reservation", "availability", "enqueue", "upload"])
+
+signature_verifier = SignatureVerifier(
+    workers=SIGNATURE_WORKERS,
+    executor_kind=SIGNATURE_EXECUTOR,
+    cache_size=SIGNATURE_CACHE_SIZE,
+)
+
+register_limiter = RateLimiter(
+    "register",
+    REGISTER_CLIENT_RATE, REGISTER_CLIENT_BURST,
+    REGISTER_GLOBAL_RATE, REGISTER_GLOBAL_BURST,
+    RATE_LIMIT_MAX_CLIENTS,
+)
+check_limiter = RateLimiter(
+    "check",
+    CHECK_CLIENT_RATE, CHECK_CLIENT_BURST,
+    CHECK_GLOBAL_RATE, CHECK_GLOBAL_BURST,
+    RATE_LIMIT_MAX_CLIENTS,
+)
+
+def client_key(request: Request) -> str:
+    """Identity used for per-client rate limits"""
+    if TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def enforce_rate_limit(limiter: RateLimiter, request: Request, cost: float = 1):
+    """Raise 429 with Retry-After if the request is over the client's or the overall budget"""
+    if not RATE_LIMIT_ENABLED:
+        return
+    # A batch costs one token per name, capped so a full batch is still admissible when buckets are full
+    wait = limiter.acquire(client_key(request), min(cost, limiter.client_burst, limiter.global_bucket.burst))
+    if wait:
+        retry_after = max(1, math.ceil(wait)) if math.isfinite(wait) else 60
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+def upstream_unavailable(error: UpstreamUnavailableError) -> HTTPException:
+    """503 response for a lookup the upstream could not answer (429 if we shed it ourselves)"""
+    if isinstance(error, UpstreamSaturatedError):
+        logger.info(f"Upstream saturated: {error}")
+        return HTTPException(
+            status_code=429,
+            detail="Server busy, please retry",
+            headers={"Retry-After": "1"}
+        )
+    logger.error(f"Upstream unavailable: {error}")
+    return HTTPException(
+        status_code=503,
+        detail="Irys upstream unavailable, please retry",
+        headers={"Retry-After": str(irys_service.graphql_breaker.retry_after())}
+    )
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match covers etag"""
+    header = request.headers.get("if-none-match")
+    if not header:
         return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def cached_response(request: Request, content: Any, etag: str, max_age: int) -> Response:
+    """JSON response (or pre-serialized JSON bytes) with validators, or an empty 304 if the client already holds this version"""
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if isinstance(content, bytes):
+        return Response(content, media_type="application/json", headers=headers)
+    return FastJSONResponse(content, headers=headers)
 
 @app.get("/")
 async def root():
     return {"message": "Irys Username API is running!", "version": "1.0.0"}
 
-@app.get("/api/username/check/{username}", response_model=UsernameAvailabilityResponse)
-async def check_username_availability(username: str):
+async def collect_samples() -> List[Tuple[str, str, Dict[str, str], float]]:
+    """Point-in-time samples from the service components, for /metrics"""
+    samples = []
+    for upstream, pool in irys_service.pool_stats().items():
+        labels = {"upstream": upstream}
+        samples.append(("irys_upstream_pool_connections", "gauge", labels, pool["connections"]))
+        samples.append(("irys_upstream_pool_active", "gauge", labels, pool["active"]))
+        samples.append(("irys_upstream_pool_idle", "gauge", labels, pool["idle"]))
+        samples.append(("irys_upstream_in_flight", "gauge", labels, pool["in_flight"]))
+        samples.append(("irys_upstream_pool_saturation", "gauge", labels, pool["in_flight"] / pool["max_connections"]))
+        samples.append(("irys_upstream_pool_waits_total", "counter", labels, pool["waits"]))
+        samples.append(("irys_upstream_rejected_total", "counter", labels, pool["rejected"]))
+    
+    health = irys_service.upstream_health()
+    breaker_states = {"closed": 0, "half_open": 1, "open": 2}
+    samples.append(("irys_graphql_breaker_state", "gauge", {}, breaker_states[health["graphql_breaker"]["state"]]))
+    samples.append(("irys_graphql_breaker_trips_total", "counter", {}, health["graphql_breaker"]["trips"]))
+    samples.append(("irys_graphql_breaker_rejected_total", "counter", {}, health["graphql_breaker"]["rejected"]))
+    samples.append(("irys_graphql_hedges_total", "counter", {}, health["hedging"]["hedges"]))
+    samples.append(("irys_graphql_hedge_wins_total", "counter", {}, health["hedging"]["hedge_wins"]))
+    samples.append(("irys_stale_fallbacks_total", "counter", {}, health["stale_fallbacks"]))
+    
+    cache = irys_service.username_cache.stats()
+    samples.append(("irys_username_cache_size", "gauge", {}, cache["size"]))
+    samples.append(("irys_username_cache_hit_ratio", "gauge", {}, cache["hit_ratio"]))
+    samples.append(("irys_username_cache_hits_total", "counter", {}, cache["hits"]))
+    samples.append(("irys_username_cache_misses_total", "counter", {}, cache["misses"]))
+    samples.append(("irys_username_cache_evictions_total", "counter", {}, cache["evictions"]))
+    samples.append(("irys_single_flight_deduplicated_total", "counter", {}, irys_service.lookup_flight.deduplicated))
+    
+    signatures = signature_verifier.stats()
+    samples.append(("irys_signature_cache_hits_total", "counter", {}, signatures["cache_hits"]))
+    samples.append(("irys_signature_cache_misses_total", "counter", {}, signatures["cache_misses"]))
+    
+    samples.append(("irys_registry_usernames", "gauge", {}, len(irys_service.registry)))
+    samples.append(("irys_registry_synced", "gauge", {}, 1 if irys_service.registry.is_current() else 0))
+    samples.append(("irys_reservations_pending", "gauge", {}, irys_service.reservations.stats()["pending"]))
+    
+    feed = irys_service.feed.stats()
+    samples.append(("irys_feed_subscribers", "gauge", {}, feed["subscribers"]))
+    samples.append(("irys_feed_published_total", "counter", {}, feed["published"]))
+    samples.append(("irys_feed_overflows_total", "counter", {}, feed["overflows"]))
+    
+    if irys_service.outbox is not None:
+        outbox = await irys_service.outbox.stats()
+        samples.append(("irys_outbox_pending", "gauge", {}, outbox["pending"] + outbox["uploading"]))
+        samples.append(("irys_outbox_enqueued_total", "counter", {}, outbox["enqueued_total"]))
+        samples.append(("irys_outbox_confirmed_total", "counter", {}, outbox["confirmed_total"]))
+        samples.append(("irys_outbox_retries_total", "counter", {}, outbox["retried_total"]))
+        samples.append(("irys_outbox_failed_total", "counter", {}, outbox["failed_total"]))
+    
+    uploads = irys_service.upload_batcher.stats()
+    samples.append(("irys_upload_queue_depth", "gauge", {}, uploads["queued"]))
+    samples.append(("irys_upload_batches_total", "counter", {}, uploads["batches"]))
+    samples.append(("irys_upload_items_total", "counter", {}, uploads["items"]))
+    
+    for limiter in (register_limiter, check_limiter):
+        limits = limiter.stats()
+        samples.append(("irys_rate_limit_allowed_total", "counter", {"limit": limiter.name}, limits["allowed"]))
+        samples.append(("irys_rate_limited_total", "counter", {"limit": limiter.name, "scope": "client"}, limits["limited_client"]))
+        samples.append(("irys_rate_limited_total", "counter", {"limit": limiter.name, "scope": "global"}, limits["limited_global"]))
+    
+    for stage, stats in registration_stages.snapshot().items():
+        labels = {"stage": stage}
+        samples.append(("irys_registration_stage_passed_total", "counter", labels, stats["passed"]))
+        samples.append(("irys_registration_stage_rejected_total", "counter", labels, stats["rejected"]))
+    return samples
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of request, upstream and component metrics"""
+    return PlainTextResponse(metrics.render(await collect_samples()), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/pool/stats")
+async def get_pool_stats():
+    """Connection pool statistics for each upstream"""
+    return irys_service.pool_stats()
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Username lookup cache and request coalescing statistics"""
+    return {
+        **irys_service.username_cache.stats(),
+        "single_flight": irys_service.lookup_flight.stats(),
+    }
+
+@app.get("/api/signature/stats")
+async def get_signature_stats():
+    """Signature verification pool, cache and latency statistics"""
+    return signature_verifier.stats()
+
+@app.get("/api/registration/stats")
+async def get_registration_stats():
+    """Per-stage timings and rejection counts of the registration pipeline"""
+    return registration_stages.snapshot()
+
+@app.get("/api/upload/stats")
+async def get_upload_stats():
+    """Upload batching (helper) or native uploader statistics"""
+    if irys_service.native_uploader is not None:
+        return {"uploader": "native", **irys_service.native_uploader.stats()}
+    return {"uploader": "helper", **irys_service.upload_batcher.stats()}
+
+@app.get("/api/outbox/stats")
+async def get_outbox_stats():
+    """Registration outbox backlog, delivery counters and latency"""
+    if irys_service.outbox is None:
+        return {"enabled": False}
+    return {"enabled": True, **(await irys_service.outbox.stats())}
+
+@app.get("/api/registration/{ticket}")
+async def get_registration_status(ticket: str):
+    """Status of a registration accepted into the outbox"""
+    if not TICKET_PATTERN.fullmatch(ticket):
+        raise HTTPException(status_code=400, detail="Invalid ticket")
+    entry = await irys_service.outbox.get(ticket) if irys_service.outbox is not None else None
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return {
+        "ticket": entry.ticket,
+        "username": entry.username,
+        "owner": entry.owner,
+        "status": entry.status,
+        "attempts": entry.attempts,
+        "tx_id": entry.tx_id,
+        "explorer_url": f"{IRYS_GATEWAY_URL}/{entry.tx_id}" if entry.tx_id else None,
+        "error": entry.error,
+        "created_at": entry.created_at,
+        "updated_at": entry.updated_at,
+    }
+
+@app.get("/api/reservations/stats")
+async def get_reservation_stats():
+    """Pending registration reservations"""
+    return irys_service.reservations.stats()
+
+@app.get("/api/feed/stats")
+async def get_feed_stats():
+    """Live registration feed subscribers and delivery counters"""
+    return irys_service.feed.stats()
+
+@app.get("/api/ratelimit/stats")
+async def get_rate_limit_stats():
+    """Admission control counters for each endpoint class"""
+    return {
+        "enabled": RATE_LIMIT_ENABLED,
+        "register": register_limiter.stats(),
+        "check": check_limiter.stats(),
+    }
+
+@app.get("/api/upstream/health")
+async def get_upstream_health():
+    """GraphQL circuit breaker, hedging and fallback statistics"""
+    return irys_service.upstream_health()
+
+@app.get("/api/stats")
+async def get_stats(request: Request):
+    """Totals, registrations per day, top owners and newest names, precomputed from the local registry"""
+    try:
+        body, etag = await irys_service.registry_summary()
+        return cached_response(request, body, etag, STATS_CACHE_MAX_AGE)
+    except Exception as error:
+        logger.error(f"Stats error: {error}")
+        raise HTTPException(status_code=500, detail="Failed to compute stats")
+
+@app.get("/api/registry/stats")
+async def get_registry_stats():
+    """Local registry sync status"""
+    return {**irys_service.registry.stats(), "leader": irys_service.registry_leader}
+
+@app.get("/api/username/check/{username}", response_model=UsernameAvailabilityResponse, response_model_exclude_none=True)
+async def check_username_availability(username: str, http_request: Request):
     """Check if a username is available"""
     try:
+        enforce_rate_limit(check_limiter, http_request)
+        
         # Validate username format
-        if not irys_service.is_valid_username(username):
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid username format. Must be 3-20 characters (letters, numbers, underscores)"
-            )
+        require_valid_username(username)
         
         available = await irys_service.check_username_availability(username)
         
         return UsernameAvailabilityResponse(
             username=username,
-            available=available
+            available=available,
+            suggestions=None if available else irys_service.suggest_alternatives(username)
         )
         
     except HTTPException:
         raise
+    except UpstreamUnavailableError as error:
+        raise upstream_unavailable(error)
     except Exception as error:
         logger.error(f"Check availability error: {error}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@app.post("/api/username/register", response_model=UsernameRegistrationResponse)
-async def register_username(request: UsernameRegistrationRequest):
-    """Register a new username"""
+@app.post(
+    "/api/username/register",
+    response_model=UsernameRegistrationResponse,
+    responses={202: {"model": RegistrationTicketResponse}}
+)
+async def register_username(request: UsernameRegistrationRequest, http_request: Request):
+    """Register a new username
+    
+    Stages run cheapest first so that bad requests are rejected before any upstream work:
+    format check, signature verification, reservation, availability check, upload.
+    With the outbox enabled the upload is replaced by a durable enqueue and the response is
+    202 with a ticket to poll at /api/registration/{ticket}.
+    """
     try:
-        # Validate username format
-        if not irys_service.is_valid_username(request.username):
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid username format"
-            )
+        enforce_rate_limit(register_limiter, http_request)
         
-        # Check availability
-        available = await irys_service.check_username_availability(request.username)
-        if not available:
-            raise HTTPException(
-                status_code=409,
-                detail="Username is already taken"
-            )
+        with registration_stages.stage("format"):
+            if not is_valid_username(request.username):
+                raise HTTPException(
+                    status_code=400,
+                    detail="Invalid username format"
+                )
+            if normalize_address(request.address) is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Invalid address"
+                )
         
-        # Verify signature
-        message = f"Register username: {request.username}"
-        if not verify_signature(message, request.signature, request.address):
-            raise HTTPException(
-                status_code=401,
-                detail="Signature verification failed"
-            )
+        with registration_stages.stage("signature"):
+            message = f"Register username: {request.username}"
+            if not await signature_verifier.verify(message, request.signature, request.address):
+                raise HTTPException(
+                    status_code=401,
+                    detail="Signature verification failed"
+                )
         
-        # Upload to Irys
-        result = await irys_service.upload_username_to_irys(
-            request.username,
-            request.address,
-            request.metadata
-        )
+        normalized_username = request.username.lower()
+        normalized_owner = request.address.lower()
+        with registration_stages.stage("reservation"):
+            if not await irys_service.reservations.reserve(normalized_username, normalized_owner):
+                raise HTTPException(
+                    status_code=409,
+                    detail="Username registration already in progress"
+                )
         
-        if not result.get("success"):
-            raise HTTPException(
-                status_code=500,
-                detail=result.get("error", "Upload failed")
-            )
+        queued = False
+        try:
+            with registration_stages.stage("availability"):
+                # Look past our own reservation to the registry, cache or GraphQL
+                record = await irys_service.lookup_username(normalized_username)
+                if record is not None:
+                    raise HTTPException(
+                        status_code=409,
+                        detail="Username is already taken"
+                    )
+            
+            if irys_service.outbox is not None:
+                with registration_stages.stage("enqueue"):
+                    entry = await irys_service.outbox.enqueue(normalized_username, normalized_owner, request.metadata)
+                    if entry is None:
+                        raise HTTPException(
+                            status_code=409,
+                            detail="Username registration already in progress"
+                        )
+                # The reservation now belongs to the outbox, which releases it once the upload is settled
+                queued = True
+                return FastJSONResponse(
+                    RegistrationTicketResponse(
+                        success=True,
+                        ticket=entry.ticket,
+                        username=request.username,
+                        owner=request.address,
+                        status=entry.status,
+                        status_url=f"/api/registration/{entry.ticket}",
+                        message=f"{request.username}.irys registration accepted"
+                    ).model_dump(),
+                    status_code=202
+                )
+            
+            with registration_stages.stage("upload"):
+                result = await irys_service.upload_username_to_irys(
+                    request.username,
+                    request.address,
+                    request.metadata
+                )
+                
+                if not result.get("success"):
+                    raise HTTPException(
+                        status_code=500,
+                        detail=result.get("error", "Upload failed")
+                    )
+            
+            await irys_service.on_registered(UsernameRecord(
+                id=result["id"],
+                username=normalized_username,
+                owner=normalized_owner,
+                timestamp=int(result.get("timestamp") or time.time() * 1000)
+            ))
+        finally:
+            if not queued:
+                await irys_service.reservations.release(normalized_username)
         
         return UsernameRegistrationResponse(
             success=True,
@@ -385,45 +2059,331 @@ async def register_username(request: UsernameRegistrationRequest):
         
     except HTTPException:
         raise
+    except UpstreamUnavailableError as error:
+        raise upstream_unavailable(error)
     except Exception as error:
         logger.error(f"Registration error: {error}")
         raise HTTPException(status_code=500, detail="Registration failed")
 
+async def _batch_lookup(usernames: List[str], lookup=None):
+    """Validate a batch of usernames and look up the valid ones. Returns (errors, records) keyed by input name.
+    
+    lookup defaults to irys_service.lookup_usernames; any function with the same contract will do.
+    """
+    lookup = lookup or irys_service.lookup_usernames
+    if len(usernames) > BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many usernames. Maximum batch size is {BATCH_MAX_SIZE}"
+        )
+    
+    valid = [username.lower() for username in usernames if is_valid_username(username)]
+    records = await lookup(valid)
+    
+    errors = {}
+    for username in usernames:
+        if not is_valid_username(username):
+            errors[username] = "Invalid username format"
+        elif isinstance(records[username.lower()], Exception):
+            errors[username] = "Lookup failed"
+    return errors, records
+
+@app.post("/api/resolve/batch")
+async def resolve_usernames_batch(request: BatchUsernamesRequest):
+    """Resolve many usernames at once; results are returned in input order"""
+    try:
+        errors, records = await _batch_lookup(request.usernames)
+        
+        results = []
+        for username in request.usernames:
+            if username in errors:
+                results.append({"username": username, "found": False, "record": None, "error": errors[username]})
+            else:
+                record = records[username.lower()]
+                results.append({
+                    "username": username,
+                    "found": record is not None,
+                    "record": record,
+                    "error": None
+                })
+        
+        return FastJSONResponse({"results": results, "count": len(results)})
+        
+    except HTTPException:
+        raise
+    except UpstreamUnavailableError as error:
+        raise upstream_unavailable(error)
+    except Exception as error:
+        logger.error(f"Batch resolve error: {error}")
+        raise HTTPException(status_code=500, detail="Failed to resolve usernames")
+
+@app.post("/api/username/check/batch")
+async def check_usernames_batch(request: BatchUsernamesRequest, http_request: Request):
+    """Check availability of many usernames at once; results are returned in input order"""
+    try:
+        enforce_rate_limit(check_limiter, http_request, cost=len(request.usernames))
+        
+        errors, availability = await _batch_lookup(request.usernames, irys_service.check_usernames_availability)
+        
+        results = []
+        for username in request.usernames:
+            if username in errors:
+                results.append({"username": username, "available": None, "error": errors[username]})
+            else:
+                results.append({"username": username, "available": availability[username.lower()], "error": None})
+        
+        return {"results": results, "count": len(results)}
+        
+    except HTTPException:
+        raise
+    except UpstreamUnavailableError as error:
+        raise upstream_unavailable(error)
+    except Exception as error:
+        logger.error(f"Batch availability error: {error}")
+        raise HTTPException(status_code=500, detail="Failed to check usernames")
+
+@app.get("/api/reverse/{address}")
+async def reverse_resolve(address: str):
+    """Resolve an owner address to the usernames it holds"""
+    try:
+        owner = normalize_address(address)
+        if owner is None:
+            raise HTTPException(status_code=400, detail="Invalid address")
+        
+        owned = await irys_service.reverse_lookup([owner])
+        
+        return {
+            "address": to_checksum_address(owner),
+            "usernames": owned[owner],
+            "count": len(owned[owner])
+        }
+        
+    except HTTPException:
+        raise
+    except UpstreamUnavailableError as error:
+        raise upstream_unavailable(error)
+    except Exception as error:
+        logger.error(f"Reverse resolve error: {error}")
+        raise HTTPException(status_code=500, detail="Failed to reverse resolve address")
+
+@app.post("/api/reverse/batch")
+async def reverse_resolve_batch(request: BatchAddressesRequest):
+    """Reverse resolve many addresses at once; results are returned in input order"""
+    try:
+        if len(request.addresses) > BATCH_MAX_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many addresses. Maximum batch size is {BATCH_MAX_SIZE}"
+            )
+        
+        owners = [normalize_address(address) for address in request.addresses]
+        owned = await irys_service.reverse_lookup(list(dict.fromkeys(o for o in owners if o)))
+        
+        results = []
+        for address, owner in zip(request.addresses, owners):
+            if owner is None:
+                results.append({"address": address, "usernames": [], "error": "Invalid address"})
+            else:
+                results.append({"address": to_checksum_address(owner), "usernames": owned[owner], "error": None})
+        
+        return {"results": results, "count": len(results)}
+        
+    except HTTPException:
+        raise
+    except UpstreamUnavailableError as error:
+        raise upstream_unavailable(error)
+    except Exception as error:
+        logger.error(f"Batch reverse resolve error: {error}")
+        raise HTTPException(status_code=500, detail="Failed to reverse resolve addresses")
+
+@app.get("/api/search")
+async def search_usernames(prefix: str, limit: int = 20):
+    """Registered usernames starting with prefix, from the local registry"""
+    if not SEARCH_TERM_PATTERN.fullmatch(prefix):
+        raise HTTPException(status_code=400, detail="prefix must be 1-20 letters, numbers or underscores")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    
+    # Until the startup build finishes there is nothing to search; the response says so rather than waiting
+    index = irys_service.registry.index
+    usernames = index.prefix(prefix.lower(), min(limit, SEARCH_MAX_LIMIT)) if index is not None else []
+    return {
+        "prefix": prefix,
+        "usernames": usernames,
+        "count": len(usernames),
+        "complete": index is not None and irys_service.registry.is_current()
+    }
+
+@app.get("/api/search/similar")
+async def search_similar_usernames(name: str, distance: int = SEARCH_MAX_DISTANCE, limit: int = 20):
+    """Registered usernames within 1-2 edits of name, closest first"""
+    if not SEARCH_TERM_PATTERN.fullmatch(name):
+        raise HTTPException(status_code=400, detail="name must be 1-20 letters, numbers or underscores")
+    if not 1 <= distance <= SEARCH_MAX_DISTANCE:
+        raise HTTPException(status_code=400, detail=f"distance must be between 1 and {SEARCH_MAX_DISTANCE}")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    
+    index = irys_service.registry.index
+    matches = index.similar(name.lower(), distance, min(limit, SEARCH_MAX_LIMIT)) if index is not None else []
+    return {
+        "name": name,
+        "matches": [{"username": username, "distance": edit} for username, edit in matches],
+        "count": len(matches),
+        "complete": index is not None and irys_service.registry.is_current()
+    }
+
 @app.get("/api/resolve/{username}")
-async def resolve_username(username: str):
+async def resolve_username(username: str, request: Request):
     """Resolve username to owner address"""
     try:
+        require_valid_username(username)
         record = await irys_service.resolve_username(username)
         
         if not record:
             raise HTTPException(
                 status_code=404,
-                detail="Username not found"
+                detail="Username not found",
+                headers={"Cache-Control": f"public, max-age={RESOLVE_NEGATIVE_CACHE_MAX_AGE}"}
             )
         
-        return record.dict()
+        # A registration's transaction id identifies it exactly
+        return cached_response(request, record, f'"{record.id}"', RESOLVE_CACHE_MAX_AGE)
         
     except HTTPException:
         raise
+    except UpstreamUnavailableError as error:
+        raise upstream_unavailable(error)
     except Exception as error:
         logger.error(f"Resolve username error: {error}")
         raise HTTPException(status_code=500, detail="Failed to resolve username")
 
 @app.get("/api/usernames")
-async def get_usernames(limit: int = 100):
-    """Get all registered usernames for leaderboard"""
+async def get_usernames(request: Request, limit: Optional[int] = None, after: Optional[str] = None, format: str = "json"):
+    """Get registered usernames for leaderboard, one page at a time or streamed as NDJSON"""
     try:
-        usernames = await irys_service.get_all_usernames(limit)
+        if limit is not None and limit < 1:
+            raise HTTPException(status_code=400, detail="limit must be positive")
+        if after is not None and after.startswith(LOCAL_CURSOR_PREFIX) and local_cursor_offset(after) is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
         
-        return {
-            "usernames": [username.dict() for username in usernames],
-            "count": len(usernames)
-        }
+        if format == "ndjson":
+            async def stream():
+                try:
+                    async for page in irys_service.iter_usernames(after=after, limit=limit):
+                        yield b"".join(dumps_json(username) + b"\n" for username in page)
+                except Exception as error:
+                    logger.error(f"Stream usernames error: {error}")
+                    yield json.dumps({"error": "Failed to fetch usernames"}) + "\n"
+            
+            return StreamingResponse(stream(), media_type="application/x-ndjson")
+        
+        if format != "json":
+            raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+        
+        limit = min(limit or 100, LEADERBOARD_MAX_LIMIT)
+        usernames, next_cursor = await irys_service.get_all_usernames(limit, after)
+        
+        # The page is fully described by its transaction ids and where it leaves off
+        digest = hashlib.sha1()
+        for username in usernames:
+            digest.update(username.id.encode())
+            digest.update(b"\n")
+        digest.update((next_cursor or "").encode())
+        
+        return cached_response(request, {
+            "usernames": usernames,
+            "count": len(usernames),
+            "next_cursor": next_cursor
+        }, f'"{digest.hexdigest()}"', LEADERBOARD_CACHE_MAX_AGE)
         
+    except HTTPException:
+        raise
+    except UpstreamUnavailableError as error:
+        raise upstream_unavailable(error)
     except Exception as error:
         logger.error(f"Get usernames error: {error}")
         raise HTTPException(status_code=500, detail="Failed to fetch usernames")
 
+@app.get("/api/registrations/stream")
+async def stream_registrations():
+    """Server-Sent Events feed of new registrations, as they are made here or discovered upstream"""
+    subscription = irys_service.feed.subscribe()
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many live subscribers, please poll instead")
+    
+    async def events():
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                batch = await subscription.next_batch(FEED_HEARTBEAT_INTERVAL)
+                if subscription.overflowed:
+                    yield b"event: overflow\ndata: {}\n\n"
+                    return
+                if subscription.closed:
+                    return
+                if not batch:
+                    # Comment line keeps proxies from timing out an idle connection
+                    yield b": keepalive\n\n"
+                    continue
+                yield b"".join(
+                    b"id: %s\nevent: registration\ndata: %s\n\n" % (record.id.encode(), dumps_json(record))
+                    for record in batch
+                )
+        finally:
+            irys_service.feed.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/api/registrations/ws")
+async def registrations_websocket(websocket: WebSocket):
+    """WebSocket feed of new registrations; each message is a JSON array of records"""
+    subscription = irys_service.feed.subscribe()
+    if subscription is None:
+        await websocket.close(code=1013)
+        return
+    
+    await websocket.accept()
+    client_gone = asyncio.Event()
+    
+    async def watch_disconnect():
+        # Clients only listen, so the next inbound message we care about is the close
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+        client_gone.set()
+        subscription.closed = True
+        subscription.ready.set()
+    
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        while True:
+            batch = await subscription.next_batch(FEED_HEARTBEAT_INTERVAL)
+            if client_gone.is_set():
+                return
+            if subscription.overflowed:
+                await websocket.close(code=1008, reason="Subscriber fell behind")
+                return
+            if subscription.closed:
+                await websocket.close(code=1001)
+                return
+            # An empty array doubles as a heartbeat
+            await websocket.send_text(dumps_json(batch).decode())
+    except WebSocketDisconnect:
+        pass
+    except Exception as error:
+        logger.error(f"Registration feed websocket error: {error}")
+    finally:
+        watcher.cancel()
+        irys_service.feed.unsubscribe(subscription)
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    if WORKERS > 1:
+        # Workers are separate processes: use STATE_BACKEND=sqlite (one node) or redis to share reservations
+        uvicorn.run("server:app", host="0.0.0.0", port=8001, workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8001)
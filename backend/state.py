@@ -0,0 +1,289 @@
+"""Key/value state shared between workers (memory, SQLite or Redis) and the name reservations kept in it"""
+
+import asyncio
+import sqlite3
+import time
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Tuple
+
+class MemoryStateBackend:
+    """Key/value store with expiry held in this process; only consistent with a single worker"""
+
+    shared = False
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[str, float]] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._entries[key]
+            return None
+        return entry[0]
+
+    async def set(self, key: str, value: str, ttl: float, only_if_absent: bool = False) -> bool:
+        if only_if_absent and await self.get(key) is not None:
+            return False
+        self._entries[key] = (value, time.time() + ttl)
+        return True
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "keys": len(self._entries)}
+
+class SQLiteStateBackend:
+    """Key/value store with expiry in a SQLite file, shared by all workers on one node"""
+
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        # One thread owns the connection: calls run in order, off the event loop, and may wait on the file lock
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-sqlite")
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+        return self._db
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._run(self._get, key)
+
+    async def set(self, key: str, value: str, ttl: float, only_if_absent: bool = False) -> bool:
+        return await self._run(self._set, key, value, ttl, only_if_absent)
+
+    async def delete(self, key: str):
+        await self._run(self._delete, key)
+
+    async def close(self):
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
+
+    def _get(self, key: str) -> Optional[str]:
+        row = self.db.execute("SELECT value, expires_at FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def _set(self, key: str, value: str, ttl: float, only_if_absent: bool) -> bool:
+        now = time.time()
+        db = self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if only_if_absent:
+                row = db.execute("SELECT expires_at FROM kv WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[0] > now:
+                    db.execute("ROLLBACK")
+                    return False
+            db.execute(
+                "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                (key, value, now + ttl)
+            )
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                db.execute("DELETE FROM kv WHERE expires_at <= ?", (now,))
+            db.execute("COMMIT")
+            return True
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def _delete(self, key: str):
+        self.db.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def _close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "path": self.path}
+
+class RedisStateBackend:
+    """Key/value store with expiry on any server speaking the Redis protocol (RESP2)"""
+
+    shared = True
+
+    def __init__(self, url: str, pool_size: int):
+        parsed = httpx.URL(url)
+        self.host = parsed.host or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db_index = int(parsed.path.strip("/") or 0)
+        self.pool_size = pool_size
+        self._pool: Optional[asyncio.Queue] = None
+        self._opened = 0
+        self.commands = 0
+        self.errors = 0
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        connection = (reader, writer)
+        try:
+            if self.password:
+                await self._send(connection, "AUTH", self.password)
+            if self.db_index:
+                await self._send(connection, "SELECT", str(self.db_index))
+        except BaseException:
+            writer.close()
+            raise
+        return connection
+
+    @staticmethod
+    async def _send(connection, *args: str):
+        reader, writer = connection
+        payload = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg.encode()
+            payload.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        writer.write(b"".join(payload))
+        await writer.drain()
+        
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(f"Redis error: {rest.decode()}")
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            return (await reader.readexactly(length + 2))[:-2].decode()
+        raise RuntimeError(f"Unexpected Redis reply: {line!r}")
+
+    async def _command(self, *args: str):
+        if self._pool is None:
+            self._pool = asyncio.Queue()
+        if self._pool.empty() and self._opened < self.pool_size:
+            self._opened += 1
+            try:
+                connection = await self._connect()
+            except BaseException:
+                self._opened -= 1
+                raise
+        else:
+            connection = await self._pool.get()
+        
+        self.commands += 1
+        try:
+            result = await self._send(connection, *args)
+        except BaseException:
+            # Drop the connection, cancelled calls included: a reply may still be in flight on its stream
+            self.errors += 1
+            self._opened -= 1
+            connection[1].close()
+            raise
+        self._pool.put_nowait(connection)
+        return result
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._command("GET", key)
+
+    async def set(self, key: str, value: str, ttl: float, only_if_absent: bool = False) -> bool:
+        args = ["SET", key, value, "PX", str(max(1, int(ttl * 1000)))]
+        if only_if_absent:
+            args.append("NX")
+        return await self._command(*args) == "OK"
+
+    async def delete(self, key: str):
+        await self._command("DEL", key)
+
+    async def close(self):
+        while self._pool is not None and not self._pool.empty():
+            _, writer = self._pool.get_nowait()
+            writer.close()
+        self._opened = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "host": self.host,
+            "port": self.port,
+            "connections": self._opened,
+            "commands": self.commands,
+            "errors": self.errors,
+        }
+
+def create_state_backend(kind: str, sqlite_path: str, redis_url: str, redis_pool_size: int):
+    if kind == "sqlite":
+        return SQLiteStateBackend(sqlite_path)
+    if kind == "redis":
+        return RedisStateBackend(redis_url, redis_pool_size)
+    if kind != "memory":
+        raise ValueError(f"Unknown STATE_BACKEND '{kind}', expected memory, sqlite or redis")
+    return MemoryStateBackend()
+
+class ReservationTable:
+    """Names held while their registration upload is in flight, stored in the shared state backend"""
+
+    def __init__(self, ttl: float, backend):
+        self.ttl = ttl
+        self.backend = backend
+        self._held: set = set()
+        self.granted = 0
+        self.conflicts = 0
+
+    async def holder(self, username: str) -> Optional[str]:
+        """Owner currently holding a reservation on the name, if any"""
+        return await self.backend.get(f"reservation:{username}")
+
+    async def reserve(self, username: str, owner: str) -> bool:
+        """Hold a name for owner; fails if it is already held (by any worker)"""
+        if not await self.backend.set(f"reservation:{username}", owner, self.ttl, only_if_absent=True):
+            self.conflicts += 1
+            return False
+        self._held.add(username)
+        self.granted += 1
+        return True
+
+    async def renew(self, username: str, owner: str, ttl: float) -> bool:
+        """Extend owner's hold on a name for ttl seconds, taking it again if it has lapsed; fails if another owner holds it"""
+        key = f"reservation:{username}"
+        if not await self.backend.set(key, owner, ttl, only_if_absent=True):
+            if await self.backend.get(key) != owner:
+                self.conflicts += 1
+                return False
+            await self.backend.set(key, owner, ttl)
+        self._held.add(username)
+        return True
+
+    async def release(self, username: str, owner: Optional[str] = None):
+        """Drop the hold on a name; with owner, only if that owner still holds it"""
+        self._held.discard(username)
+        if owner is not None and await self.holder(username) != owner:
+            return
+        await self.backend.delete(f"reservation:{username}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._held),
+            "granted": self.granted,
+            "conflicts": self.conflicts,
+            "ttl": self.ttl,
+            "backend": self.backend.stats(),
+        }
@@ -0,0 +1,47 @@
+"""Formats accepted for usernames, owner addresses, transaction ids, search terms, outbox tickets and leaderboard cursors"""
+
+import re
+from typing import Optional
+from fastapi import HTTPException
+from eth_utils import to_checksum_address
+
+# Username format: 3-20 characters, alphanumeric + underscore
+USERNAME_PATTERN = re.compile(r"[A-Za-z0-9_]{3,20}")
+INVALID_USERNAME_DETAIL = "Invalid username format. Must be 3-20 characters (letters, numbers, underscores)"
+
+# Registration owners are stored as Ethereum addresses; transaction ids are 43-character base64url strings
+OWNER_PATTERN = re.compile(r"0x[0-9a-fA-F]{40}")
+MAX_TX_ID_LENGTH = 64
+
+# Prefix and fuzzy search terms may be shorter than a username
+SEARCH_TERM_PATTERN = re.compile(r"[A-Za-z0-9_]{1,20}")
+
+# Outbox tickets are uuid4 hex strings
+TICKET_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# Leaderboard pages served from the local registry are addressed by offset; anything else goes to GraphQL as is
+LOCAL_CURSOR_PREFIX = "local:"
+LOCAL_CURSOR_PATTERN = re.compile(LOCAL_CURSOR_PREFIX + r"([0-9]{1,18})")
+
+def is_valid_username(username: str) -> bool:
+    """Validate username format: 3-20 characters, alphanumeric + underscore"""
+    return bool(username) and USERNAME_PATTERN.fullmatch(username) is not None
+
+def require_valid_username(username: str):
+    """Reject a malformed username with 400 before any upstream I/O"""
+    if not is_valid_username(username):
+        raise HTTPException(status_code=400, detail=INVALID_USERNAME_DETAIL)
+
+def local_cursor_offset(after: Optional[str]) -> Optional[int]:
+    """Offset encoded in a local cursor (0 for no cursor), or None if it is not a well-formed local cursor"""
+    if after is None:
+        return 0
+    match = LOCAL_CURSOR_PATTERN.fullmatch(after)
+    return int(match.group(1)) if match else None
+
+def normalize_address(address: str) -> Optional[str]:
+    """Lowercase an Ethereum address, or return None if it is not a valid address"""
+    try:
+        return to_checksum_address(address).lower()
+    except Exception:
+        return None
@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the Irys Username API
+Starts backend/server.py against a local Irys stand-in (GraphQL + upload helper)
+and drives concurrent check / resolve / register / leaderboard workloads
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import string
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+
+WORKLOADS = ["check", "resolve", "register", "leaderboard", "mixed"]
+
+
+def deep_hash(chunk):
+    if isinstance(chunk, list):
+        accumulator = hashlib.sha384(b"list" + str(len(chunk)).encode()).digest()
+        for item in chunk:
+            accumulator = hashlib.sha384(accumulator + deep_hash(item)).digest()
+        return accumulator
+    tag = hashlib.sha384(b"blob" + str(len(chunk)).encode()).digest()
+    return hashlib.sha384(tag + hashlib.sha384(chunk).digest()).digest()
+
+
+def read_avro_long(data, offset):
+    value, shift = 0, 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return (value >> 1) ^ -(value & 1), offset
+
+
+def parse_data_item(item, verify=True):
+    """Parse (and optionally verify) an Ethereum-signed (type 3) ANS-104 data item; returns (id, tags, data)"""
+    from eth_account import Account
+    from eth_account.messages import encode_defunct
+    from eth_keys import keys
+
+    if struct.unpack_from("<H", item, 0)[0] != 3:
+        raise ValueError("unsupported signature type")
+    signature, owner = item[2:67], item[67:132]
+    offset = 132
+    target = b""
+    if item[offset]:
+        target = item[offset + 1:offset + 33]
+        offset += 32
+    offset += 1
+    anchor = b""
+    if item[offset]:
+        anchor = item[offset + 1:offset + 33]
+        offset += 32
+    offset += 1
+    tag_count, tag_bytes_length = struct.unpack_from("<QQ", item, offset)
+    offset += 16
+    raw_tags = item[offset:offset + tag_bytes_length]
+    data = item[offset + tag_bytes_length:]
+
+    tags = []
+    position = 0
+    if tag_count:
+        block, position = read_avro_long(raw_tags, 0)
+        for _ in range(block):
+            fields = []
+            for _ in range(2):
+                length, position = read_avro_long(raw_tags, position)
+                fields.append(raw_tags[position:position + length].decode())
+                position += length
+            tags.append(tuple(fields))
+
+    if verify:
+        message = deep_hash([b"dataitem", b"1", b"3", owner, target, anchor, raw_tags, data])
+        signer = Account.recover_message(encode_defunct(primitive=message), signature=signature)
+        if signer != keys.PublicKey(owner[1:]).to_checksum_address():
+            raise ValueError("signature does not match owner")
+    item_id = base64.urlsafe_b64encode(hashlib.sha256(signature).digest()).rstrip(b"=").decode()
+    return item_id, tags, data
+
+
+def create_standin_app(seed_names, graphql_latency_ms, upload_latency_ms, error_rate, verify_data_items=False):
+    """Local stand-in for the Irys GraphQL endpoint, the Node upload helper and a bundler node"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    app = FastAPI(title="Irys stand-in")
+    registrations = []  # transaction nodes in upload order
+    by_username = {}
+
+    def add_registration(username, owner, tx_id=None):
+        node = {
+            "id": tx_id or f"tx_{len(registrations)}_{username}",
+            "tags": [
+                {"name": "App-Name", "value": "IrysUsername"},
+                {"name": "Type", "value": "username-registration"},
+                {"name": "Username", "value": username},
+                {"name": "Owner", "value": owner},
+                {"name": "Timestamp", "value": str(int(time.time() * 1000))},
+            ],
+        }
+        registrations.append(node)
+        by_username.setdefault(username, []).append(len(registrations) - 1)
+        return node
+
+    for i in range(seed_names):
+        add_registration(f"seed_{i}", "0x" + f"{i:040x}")
+
+    async def simulate(latency_ms):
+        if latency_ms:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * latency_ms / 1000)
+        return random.random() < error_rate
+
+    @app.post("/graphql")
+    async def graphql(request: Request):
+        if await simulate(graphql_latency_ms):
+            return JSONResponse({"errors": [{"message": "simulated failure"}]}, status_code=502)
+
+        variables = (await request.json()).get("variables", {})
+        names = variables.get("usernames") or ([variables["username"]] if "username" in variables else None)
+        if names is not None:
+            indexes = sorted(i for name in names for i in by_username.get(name, []))
+        else:
+            indexes = range(len(registrations))
+        owners = variables.get("owners")
+        if owners is not None:
+            indexes = [i for i in indexes if registrations[i]["tags"][3]["value"] in owners]
+
+        after = int(variables.get("after") or -1)
+        first = variables.get("first") or variables.get("limit") or 100
+        page = [i for i in indexes if i > after][:first + 1]
+        edges = [{"cursor": str(i), "node": registrations[i]} for i in page[:first]]
+        return {"data": {"transactions": {"edges": edges, "pageInfo": {"hasNextPage": len(page) > first}}}}
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        body = await request.json()
+        if await simulate(upload_latency_ms):
+            return JSONResponse({"success": False, "error": "simulated failure"}, status_code=500)
+        node = add_registration(body["username"], body["owner"])
+        return {"success": True, "id": node["id"], "timestamp": int(time.time() * 1000)}
+
+    @app.post("/upload/batch")
+    async def upload_batch(request: Request):
+        items = (await request.json())["items"]
+        if await simulate(upload_latency_ms):
+            return JSONResponse({"success": False, "error": "simulated failure"}, status_code=500)
+        results = []
+        for item in items:
+            node = add_registration(item["username"], item["owner"])
+            results.append({"success": True, "id": node["id"], "timestamp": int(time.time() * 1000)})
+        return {"results": results}
+
+    @app.post("/tx/{token}")
+    async def bundler_upload(token: str, request: Request):
+        item = await request.body()
+        if await simulate(upload_latency_ms):
+            return JSONResponse({"error": "simulated failure"}, status_code=500)
+        try:
+            item_id, tags, _ = parse_data_item(item, verify=verify_data_items)
+        except Exception as error:
+            return JSONResponse({"error": f"invalid data item: {error}"}, status_code=400)
+        tag_values = dict(tags)
+        add_registration(tag_values["Username"], tag_values["Owner"], tx_id=item_id)
+        return {"id": item_id, "timestamp": int(time.time() * 1000), "version": "1.0.0"}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy", "registrations": len(registrations)}
+
+    return app
+
+
+async def serve_redis_standin(port):
+    """Minimal in-memory Redis stand-in (GET / SET PX EX NX / DEL / PING) for STATE_BACKEND=redis runs"""
+    store = {}
+
+    def read_value(key):
+        entry = store.get(key)
+        if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+            store.pop(key, None)
+            return None
+        return entry[0]
+
+    def execute(args):
+        command = args[0].upper()
+        if command == "PING":
+            return b"+PONG\r\n"
+        if command == "GET":
+            value = read_value(args[1])
+            if value is None:
+                return b"$-1\r\n"
+            data = value.encode()
+            return b"$%d\r\n%s\r\n" % (len(data), data)
+        if command == "SET":
+            key, value, expires_at, only_if_absent = args[1], args[2], None, False
+            options = [option.upper() for option in args[3:]]
+            for index, option in enumerate(options):
+                if option == "PX":
+                    expires_at = time.time() + int(args[3 + index + 1]) / 1000
+                elif option == "EX":
+                    expires_at = time.time() + int(args[3 + index + 1])
+                elif option == "NX":
+                    only_if_absent = True
+            if only_if_absent and read_value(key) is not None:
+                return b"$-1\r\n"
+            store[key] = (value, expires_at)
+            return b"+OK\r\n"
+        if command == "DEL":
+            removed = sum(1 for key in args[1:] if store.pop(key, None) is not None)
+            return b":%d\r\n" % removed
+        if command in ("AUTH", "SELECT"):
+            return b"+OK\r\n"
+        return b"-ERR unknown command\r\n"
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                args = []
+                for _ in range(int(header[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2].decode())
+                if args[0].upper() == "QUIT":
+                    writer.write(b"+OK\r\n")
+                    break
+                writer.write(execute(args))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    async with server:
+        await server.serve_forever()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class IrysBenchmark:
+    def __init__(self, args):
+        self.args = args
+        self.processes = []
+        self.base_url = f"http://127.0.0.1:{args.port}"
+        self.standin_url = f"http://127.0.0.1:{args.standin_port}"
+        self.workdir = tempfile.mkdtemp(prefix="irys-bench-")
+
+    def start(self):
+        """Start the stand-in and the API server as subprocesses"""
+        standin_cmd = [
+            sys.executable, __file__, "standin",
+            "--standin-port", str(self.args.standin_port),
+            "--seed-names", str(self.args.seed_names),
+            "--graphql-latency-ms", str(self.args.graphql_latency_ms),
+            "--upload-latency-ms", str(self.args.upload_latency_ms),
+            "--error-rate", str(self.args.error_rate),
+        ]
+        if self.args.verify_data_items:
+            standin_cmd.append("--verify-data-items")
+        self.processes.append(subprocess.Popen(standin_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        self.wait_ready(f"{self.standin_url}/health")
+
+        env = dict(os.environ)
+        env.update({
+            "IRYS_GRAPHQL_URL": f"{self.standin_url}/graphql",
+            "IRYS_HELPER_URL": self.standin_url,
+            "IRYS_BUNDLER_URL": self.standin_url,
+            "REGISTRY_DB_PATH": os.path.join(self.workdir, "registry.db"),
+            "OUTBOX_DB_PATH": os.path.join(self.workdir, "outbox.db"),
+            "REGISTRY_SNAPSHOT_PATH": os.path.join(self.workdir, "registry.snapshot"),
+            # All load comes from one address; pass RATE_LIMIT_ENABLED=true to measure admission control itself
+            "RATE_LIMIT_ENABLED": "false",
+        })
+        for item in self.args.server_env:
+            key, _, value = item.partition("=")
+            env[key] = value
+        if env.get("STATE_BACKEND") == "redis" and not any(item.startswith("REDIS_URL=") for item in self.args.server_env):
+            redis_cmd = [sys.executable, __file__, "redis-standin", "--redis-port", str(self.args.redis_port)]
+            self.processes.append(subprocess.Popen(redis_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            env["REDIS_URL"] = f"redis://127.0.0.1:{self.args.redis_port}/0"
+            time.sleep(0.5)
+        if env.get("STATE_BACKEND") == "sqlite":
+            env.setdefault("STATE_SQLITE_PATH", os.path.join(self.workdir, "state.db"))
+        server_cmd = [
+            sys.executable, "-m", "uvicorn", "server:app",
+            "--app-dir", BACKEND_DIR,
+            "--host", "127.0.0.1", "--port", str(self.args.port),
+            "--log-level", "warning",
+            "--workers", str(self.args.server_workers),
+        ]
+        env["WORKERS"] = str(self.args.server_workers)
+        self.processes.append(subprocess.Popen(server_cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        self.wait_ready(f"{self.base_url}/")
+        time.sleep(self.args.warmup)
+
+    def wait_ready(self, url, timeout=30.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                if httpx.get(url, timeout=1.0).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+    def stop(self):
+        for process in reversed(self.processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+
+    def request_factory(self, workload):
+        """Return a coroutine function issuing one request of the given workload"""
+        seed_names = max(self.args.seed_names, 1)
+
+        def random_name():
+            return "u" + "".join(random.choices(string.ascii_lowercase + string.digits, k=12))
+
+        async def check(client):
+            name = f"seed_{random.randrange(seed_names)}" if random.random() < 0.5 else random_name()
+            return await client.get(f"/api/username/check/{name}")
+
+        async def resolve(client):
+            name = f"seed_{random.randrange(seed_names)}" if random.random() < 0.8 else random_name()
+            return await client.get(f"/api/resolve/{name}")
+
+        async def leaderboard(client):
+            return await client.get("/api/usernames", params={"limit": 100})
+
+        # Signing is done up front so the curve math is not part of the measured latency
+        from eth_account import Account
+        from eth_account.messages import encode_defunct
+
+        registrations = []
+        if workload in ("register", "mixed"):
+            account = Account.create()
+            count = self.args.requests if workload == "register" else self.args.requests // 10 + 10
+            for _ in range(count):
+                name = random_name()
+                signature = Account.sign_message(
+                    encode_defunct(text=f"Register username: {name}"), private_key=account.key
+                ).signature.hex()
+                registrations.append({"username": name, "address": account.address, "signature": signature})
+
+        async def register(client):
+            return await client.post("/api/username/register", json=registrations.pop())
+
+        if workload == "mixed":
+            weighted = [check] * 60 + [resolve] * 30 + [leaderboard] * 8 + [register] * 2
+
+            async def mixed(client):
+                return await random.choice(weighted)(client)
+            return mixed
+        return {"check": check, "resolve": resolve, "register": register, "leaderboard": leaderboard}[workload]
+
+    async def run_workload(self, workload):
+        issue = self.request_factory(workload)
+        latencies = []
+        status_counts = {}
+        errors = 0
+        remaining = self.args.requests
+        limits = httpx.Limits(max_connections=self.args.concurrency, max_keepalive_connections=self.args.concurrency)
+
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=60.0) as client:
+            async def worker():
+                nonlocal remaining, errors
+                while remaining > 0:
+                    remaining -= 1
+                    started = time.perf_counter()
+                    try:
+                        response = await issue(client)
+                        status = str(response.status_code)
+                    except httpx.HTTPError:
+                        status = "transport_error"
+                    latencies.append(time.perf_counter() - started)
+                    status_counts[status] = status_counts.get(status, 0) + 1
+                    if not status.startswith(("2", "4")):
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*[worker() for _ in range(self.args.concurrency)])
+            elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "status_counts": status_counts,
+            "duration_s": elapsed,
+            "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+            "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+        }
+
+    def run(self):
+        print("🔧 Benchmark Setup:")
+        print(f"   Workloads: {', '.join(self.args.workloads)}")
+        print(f"   Requests per workload: {self.args.requests} at concurrency {self.args.concurrency}")
+        print(f"   Stand-in: {self.args.seed_names} seeded names, GraphQL {self.args.graphql_latency_ms}ms, "
+              f"upload {self.args.upload_latency_ms}ms, error rate {self.args.error_rate}\n")
+
+        self.start()
+        results = {}
+        try:
+            for workload in self.args.workloads:
+                print(f"🔍 Running {workload}...")
+                results[workload] = asyncio.run(self.run_workload(workload))
+                r = results[workload]
+                print(f"   {r['throughput_rps']:.1f} req/s  p50 {r['p50_ms']:.2f}ms  "
+                      f"p95 {r['p95_ms']:.2f}ms  p99 {r['p99_ms']:.2f}ms  errors {r['errors']}")
+        finally:
+            self.stop()
+
+        report = {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "config": {
+                key: getattr(self.args, key)
+                for key in ("requests", "concurrency", "seed_names", "graphql_latency_ms",
+                            "upload_latency_ms", "error_rate", "server_env")
+            },
+            "results": results,
+        }
+        with open(self.args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📊 Results saved to {self.args.output}")
+        return report
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(baseline_path, current_path):
+    """Print throughput and latency deltas between two saved benchmark runs"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+
+    print(f"📊 {baseline['commit']} → {current['commit']}")
+    for workload, now in current["results"].items():
+        before = baseline["results"].get(workload)
+        if before is None:
+            continue
+        print(f"   {workload}:")
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            change = (now[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            print(f"      {metric:<15} {before[metric]:>10.2f} → {now[metric]:>10.2f}  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", nargs="?", default="run", choices=["run", "standin", "redis-standin", "compare"])
+    parser.add_argument("files", nargs="*", help="baseline and current result files for compare")
+    parser.add_argument("--workloads", nargs="+", default=WORKLOADS, choices=WORKLOADS)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--standin-port", type=int, default=8102)
+    parser.add_argument("--redis-port", type=int, default=8103)
+    parser.add_argument("--server-workers", type=int, default=1,
+                        help="uvicorn worker processes; pair with --server-env STATE_BACKEND=sqlite|redis")
+    parser.add_argument("--seed-names", type=int, default=1000)
+    parser.add_argument("--graphql-latency-ms", type=float, default=50.0)
+    parser.add_argument("--upload-latency-ms", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--verify-data-items", action="store_true",
+                        help="have the stand-in bundler check data item signatures (costs stand-in CPU)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds to let the registry sync before measuring")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for server.py, e.g. REGISTRY_SYNC_ENABLED=false")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    if args.mode == "standin":
+        import uvicorn
+        app = create_standin_app(args.seed_names, args.graphql_latency_ms, args.upload_latency_ms, args.error_rate,
+                                 args.verify_data_items)
+        uvicorn.run(app, host="127.0.0.1", port=args.standin_port, log_level="warning")
+        return 0
+    if args.mode == "redis-standin":
+        asyncio.run(serve_redis_standin(args.redis_port))
+        return 0
+    if args.mode == "compare":
+        if len(args.files) != 2:
+            parser.error("compare needs a baseline and a current result file")
+        compare(*args.files)
+        return 0
+
+    IrysBenchmark(args).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
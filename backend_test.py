@@ -16,6 +16,7 @@ class IrysUsernameAPITester:
         self.base_url = base_url
         self.tests_run = 0
         self.tests_passed = 0
+        self.registration_ticket = None
         
         # Create a test account for signature testing
         self.test_account = Account.create()
@@ -123,13 +124,33 @@ class IrysUsernameAPITester:
             }
         }
         
-        return self.run_test(
+        # Accepted into the registration outbox; the upload completes in the background
+        success, response = self.run_test(
             "Username Registration - Valid",
             "POST",
             "api/username/register",
-            200,
+            202,
             data=data
         )
+        if success and isinstance(response, dict):
+            self.registration_ticket = response.get("ticket")
+        return success, response
+
+    def test_registration_status(self):
+        """Test looking up the outbox ticket of the registration above"""
+        if not self.registration_ticket:
+            return self.run_test(
+                "Registration Status - Unknown Ticket",
+                "GET",
+                f"api/registration/{'0' * 32}",
+                404
+            )
+        return self.run_test(
+            "Registration Status",
+            "GET",
+            f"api/registration/{self.registration_ticket}",
+            200
+        )
 
     def test_username_registration_taken(self):
         """Test username registration with taken username"""
@@ -187,6 +208,15 @@ class IrysUsernameAPITester:
             200
         )
 
+    def test_get_usernames_ndjson(self):
+        """Test streaming usernames as NDJSON"""
+        return self.run_test(
+            "Get Usernames - NDJSON Stream",
+            "GET",
+            "api/usernames?format=ndjson&limit=5",
+            200
+        )
+
     def test_resolve_username_existing(self):
         """Test resolving existing username"""
         return self.run_test(
@@ -205,6 +235,144 @@ class IrysUsernameAPITester:
             404
         )
 
+    def test_resolve_username_invalid(self):
+        """Test resolving a malformed username"""
+        return self.run_test(
+            "Resolve Username - Invalid Username",
+            "GET",
+            "api/resolve/ab",  # Too short
+            400
+        )
+
+    def test_resolve_username_not_modified(self):
+        """Test conditional resolve with If-None-Match"""
+        return self.run_test(
+            "Resolve Username - Not Modified",
+            "GET",
+            "api/resolve/demo",
+            304,
+            headers={"If-None-Match": "*"}
+        )
+
+    def test_pool_stats(self):
+        """Test upstream connection pool statistics"""
+        return self.run_test(
+            "Upstream Pool Stats",
+            "GET",
+            "api/pool/stats",
+            200
+        )
+
+    def test_cache_stats(self):
+        """Test username lookup cache statistics"""
+        return self.run_test(
+            "Username Cache Stats",
+            "GET",
+            "api/cache/stats",
+            200
+        )
+
+    def test_resolve_usernames_batch(self):
+        """Test batch username resolution"""
+        return self.run_test(
+            "Resolve Usernames - Batch",
+            "POST",
+            "api/resolve/batch",
+            200,
+            data={"usernames": ["demo", "nonexistentuser123", "ab"]}
+        )
+
+    def test_username_availability_batch(self):
+        """Test batch username availability check"""
+        return self.run_test(
+            "Username Availability - Batch",
+            "POST",
+            "api/username/check/batch",
+            200,
+            data={"usernames": ["demo", "testuser123", "ab"]}
+        )
+
+    def test_reverse_resolve(self):
+        """Test resolving an address to its usernames"""
+        return self.run_test(
+            "Reverse Resolve - Address",
+            "GET",
+            f"api/reverse/{self.test_address}",
+            200
+        )
+
+    def test_reverse_resolve_invalid(self):
+        """Test reverse resolution with an invalid address"""
+        return self.run_test(
+            "Reverse Resolve - Invalid Address",
+            "GET",
+            "api/reverse/not-an-address",
+            400
+        )
+
+    def test_search_prefix(self):
+        """Test prefix search over registered usernames"""
+        return self.run_test(
+            "Search Usernames - Prefix",
+            "GET",
+            "api/search?prefix=de",
+            200
+        )
+
+    def test_search_similar(self):
+        """Test similar-name search over registered usernames"""
+        return self.run_test(
+            "Search Usernames - Similar",
+            "GET",
+            "api/search/similar?name=demo",
+            200
+        )
+
+    def test_registry_aggregates(self):
+        """Test precomputed registry stats"""
+        return self.run_test(
+            "Registry Stats",
+            "GET",
+            "api/stats",
+            200
+        )
+
+    def test_feed_stats(self):
+        """Test live registration feed statistics"""
+        return self.run_test(
+            "Registration Feed Stats",
+            "GET",
+            "api/feed/stats",
+            200
+        )
+
+    def test_outbox_stats(self):
+        """Test registration outbox statistics"""
+        return self.run_test(
+            "Registration Outbox Stats",
+            "GET",
+            "api/outbox/stats",
+            200
+        )
+
+    def test_rate_limit_stats(self):
+        """Test admission control statistics"""
+        return self.run_test(
+            "Rate Limit Stats",
+            "GET",
+            "api/ratelimit/stats",
+            200
+        )
+
+    def test_metrics(self):
+        """Test Prometheus metrics endpoint"""
+        return self.run_test(
+            "Prometheus Metrics",
+            "GET",
+            "metrics",
+            200
+        )
+
     def run_all_tests(self):
         """Run all API tests"""
         print("🚀 Starting Irys Username API Tests\n")
@@ -216,12 +384,29 @@ class IrysUsernameAPITester:
             self.test_username_availability_taken,
             self.test_username_availability_invalid,
             self.test_username_registration_valid,
+            self.test_registration_status,
             self.test_username_registration_taken,
             self.test_username_registration_invalid_signature,
             self.test_get_usernames_leaderboard,
             self.test_get_usernames_with_limit,
+            self.test_get_usernames_ndjson,
             self.test_resolve_username_existing,
-            self.test_resolve_username_nonexistent
+            self.test_resolve_username_nonexistent,
+            self.test_resolve_username_invalid,
+            self.test_resolve_username_not_modified,
+            self.test_pool_stats,
+            self.test_cache_stats,
+            self.test_resolve_usernames_batch,
+            self.test_username_availability_batch,
+            self.test_reverse_resolve,
+            self.test_reverse_resolve_invalid,
+            self.test_search_prefix,
+            self.test_search_similar,
+            self.test_registry_aggregates,
+            self.test_feed_stats,
+            self.test_rate_limit_stats,
+            self.test_outbox_stats,
+            self.test_metrics
         ]
         
         for test in tests:
@@ -23,6 +23,20 @@ const signMessage = async (signer, message) => {
   return await signer.signMessage(message);
 };
 
+// Poll an outbox ticket until its upload is confirmed or has failed (or we stop waiting)
+const waitForRegistration = async (ticket, attempts = 60, interval = 1000) => {
+  let status = null;
+  for (let i = 0; i < attempts; i++) {
+    const response = await axios.get(`${API_URL}/api/registration/${ticket}`);
+    status = response.data;
+    if (status.status === 'confirmed' || status.status === 'failed') {
+      break;
+    }
+    await new Promise((resolve) => setTimeout(resolve, interval));
+  }
+  return status;
+};
+
 // Username Registration Component
 const UsernameRegistration = () => {
   const [walletAddress, setWalletAddress] = useState('');
@@ -55,12 +69,13 @@ const UsernameRegistration = () => {
 
     try {
       const response = await axios.get(`${API_URL}/api/username/check/${username}`);
-      const { available } = response.data;
+      const { available, suggestions } = response.data;
       setAvailability(available);
       setStatusMessage(
         available 
           ? `✅ "${username}.irys" is available!` 
-          : `❌ "${username}.irys" is already taken.`
+          : `❌ "${username}.irys" is already taken.` +
+            (suggestions && suggestions.length ? ` Try: ${suggestions.join(', ')}` : '')
       );
     } catch (err) {
       console.error(err);
@@ -110,6 +125,20 @@ const UsernameRegistration = () => {
         }
       });
 
+      if (response.status === 202) {
+        // Accepted into the outbox: poll the ticket until the upload lands
+        setStatusMessage(`⏳ "${username}.irys" accepted, uploading to Irys...`);
+        const status = await waitForRegistration(response.data.ticket);
+        if (status.status === 'failed') {
+          setStatusMessage(`Registration failed: ${status.error || 'upload failed'}`);
+          return;
+        }
+        if (status.status !== 'confirmed') {
+          setStatusMessage(`⏳ "${username}.irys" is still being uploaded (ticket ${response.data.ticket}).`);
+          return;
+        }
+      }
+
       if (response.data.success) {
         setStatusMessage(`✅ Successfully registered "${username}.irys"!`);
         setUsername('');
@@ -294,17 +323,50 @@ const UsernameResolver = () => {
 // Leaderboard Component
 const Leaderboard = () => {
   const [usernames, setUsernames] = useState([]);
+  const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
 
   useEffect(() => {
     fetchUsernames();
-    // Auto-refresh every 30 seconds
-    const interval = setInterval(fetchUsernames, 30000);
-    return () => clearInterval(interval);
+    if (typeof EventSource === 'undefined') {
+      // Auto-refresh every 30 seconds
+      const interval = setInterval(fetchUsernames, 30000);
+      return () => clearInterval(interval);
+    }
+
+    // Live feed of new registrations; refetch whenever the stream (re)connects to catch up on anything missed
+    const source = new EventSource(`${API_URL}/api/registrations/stream`);
+    let connected = false;
+    source.onopen = () => {
+      if (connected) fetchUsernames();
+      connected = true;
+    };
+    source.addEventListener('registration', (event) => {
+      const record = JSON.parse(event.data);
+      fetchStats();
+      setUsernames((current) => {
+        if (current.length >= 100 || current.some((item) => item.username === record.username)) {
+          return current;
+        }
+        return [...current, record];
+      });
+    });
+    return () => source.close();
   }, []);
 
+  // Totals are precomputed server-side, so the page doesn't need the full list to count them
+  const fetchStats = async () => {
+    try {
+      const response = await axios.get(`${API_URL}/api/stats`);
+      setStats(response.data);
+    } catch (err) {
+      console.error('Error fetching stats:', err);
+    }
+  };
+
   const fetchUsernames = async () => {
+    fetchStats();
     try {
       setLoading(true);
       const response = await axios.get(`${API_URL}/api/usernames?limit=100`);
@@ -342,11 +404,11 @@ const Leaderboard = () => {
       <h2>🏆 Username Leaderboard</h2>
       <div className="leaderboard-stats">
         <div className="stat">
-          <span className="stat-number">{usernames.length}</span>
+          <span className="stat-number">{stats ? stats.total : usernames.length}</span>
           <span className="stat-label">Total Registered</span>
         </div>
         <div className="stat">
-          <span className="stat-number">{new Set(usernames.map(u => u.owner)).size}</span>
+          <span className="stat-number">{stats ? stats.owners : new Set(usernames.map(u => u.owner)).size}</span>
           <span className="stat-label">Unique Owners</span>
         </div>
       </div>
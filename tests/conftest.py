@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# The backend modules import each other by their bare names, as uvicorn runs them from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# Keep server.py's default SQLite and snapshot files out of the working tree
+_state_dir = tempfile.mkdtemp(prefix="irys-tests-")
+for name, filename in (
+    ("REGISTRY_DB_PATH", "registry.db"),
+    ("REGISTRY_SNAPSHOT_PATH", "registry.snapshot"),
+    ("OUTBOX_DB_PATH", "outbox.db"),
+    ("STATE_SQLITE_PATH", "state.db"),
+):
+    os.environ.setdefault(name, os.path.join(_state_dir, filename))
+
+
+class FakeClock:
+    """Stands in for the time module in the modules under test, so leases, backoff and refills can be stepped"""
+
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def perf_counter(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    import outbox
+    import resilience
+
+    fake = FakeClock()
+    monkeypatch.setattr(outbox, "time", fake)
+    monkeypatch.setattr(resilience, "time", fake)
+    return fake
@@ -0,0 +1,202 @@
+"""The HTTP API in-process over httpx.ASGITransport, with GraphQL and the upload helper replaced by a fake Irys"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+import server
+from registry import UsernameRecord
+from server import irys_service
+
+OWNER = "0x" + "ab" * 20
+
+
+class FakeIrys:
+    """Registrations served the way the GraphQL endpoint tags them; set down to fail every query"""
+
+    def __init__(self):
+        self.nodes = {}
+        self.down = False
+        self.queries = 0
+        self.uploads = []
+
+    def register(self, username, owner=OWNER, timestamp=None):
+        self.nodes[username] = {
+            "id": f"tx_{username}",
+            "tags": [
+                {"name": "App-Name", "value": "IrysUsername"},
+                {"name": "Type", "value": "username-registration"},
+                {"name": "Username", "value": username},
+                {"name": "Owner", "value": owner},
+                {"name": "Timestamp", "value": str(timestamp or int(time.time() * 1000))},
+            ],
+        }
+
+    def graphql(self, request):
+        self.queries += 1
+        if self.down:
+            return httpx.Response(502)
+        variables = json.loads(request.content).get("variables", {})
+        names = variables.get("usernames") or ([variables["username"]] if "username" in variables else list(self.nodes))
+        edges = [{"cursor": name, "node": self.nodes[name]} for name in names if name in self.nodes]
+        return httpx.Response(200, json={"data": {"transactions": {"edges": edges, "pageInfo": {"hasNextPage": False}}}})
+
+    def helper(self, request):
+        body = json.loads(request.content)
+        self.uploads.append(body)
+        self.register(body["username"], body["owner"])
+        return httpx.Response(200, json={"success": True, "id": f"tx_{body['username']}", "timestamp": int(time.time() * 1000)})
+
+
+@pytest.fixture
+def irys(monkeypatch):
+    fake = FakeIrys()
+    monkeypatch.setattr(irys_service.graphql_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(fake.graphql)))
+    monkeypatch.setattr(
+        irys_service.helper_client, "_client",
+        httpx.AsyncClient(base_url=irys_service.helper_url, transport=httpx.MockTransport(fake.helper)),
+    )
+    irys_service.username_cache._entries.clear()
+    irys_service.graphql_breaker.record_success()
+    return fake
+
+
+def call(method, url, **kwargs):
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as client:
+            return await client.request(method, url, **kwargs)
+
+    return asyncio.run(send())
+
+
+def test_registration_is_queued_in_the_outbox(irys):
+    account = Account.create()
+    signature = Account.sign_message(encode_defunct(text="Register username: Queued"), private_key=account.key).signature.hex()
+    body = {"username": "Queued", "address": account.address, "signature": signature}
+
+    response = call("POST", "/api/username/register", json=body)
+    assert response.status_code == 202
+    ticket = response.json()["ticket"]
+    assert call("GET", f"/api/registration/{ticket}").json()["status"] == "pending"
+    # The shared reservation stays with the queued entry, so other nodes see the name as held
+    assert asyncio.run(irys_service.reservations.holder("queued")) == account.address.lower()
+    # The queued name is no longer available, and cannot be queued twice
+    assert call("GET", "/api/username/check/queued").json()["available"] is False
+    assert call("POST", "/api/username/register", json=body).status_code == 409
+
+    bad = dict(body, signature=Account.sign_message(encode_defunct(text="something else"), private_key=account.key).signature.hex())
+    assert call("POST", "/api/username/register", json=dict(bad, username="Queued2")).status_code == 401
+
+
+def test_redelivery_does_not_upload_twice(irys):
+    entry = asyncio.run(irys_service.outbox.enqueue("redelivered", OWNER, {}))
+    # The first attempt reached Irys, but the process died before recording it
+    irys.register("redelivered")
+    retry = entry._replace(attempts=2)
+
+    result = asyncio.run(irys_service.deliver_registration(retry))
+    assert result == {"success": True, "id": "tx_redelivered"}
+    assert irys.uploads == []
+
+    irys.register("lost_race", owner="0x" + "cd" * 20)
+    lost = asyncio.run(irys_service.outbox.enqueue("lost_race", OWNER, {}))._replace(attempts=2)
+    result = asyncio.run(irys_service.deliver_registration(lost))
+    assert result["success"] is False and result["retry"] is False
+
+
+def test_first_delivery_uploads_with_the_ticket_as_idempotency_key(irys, monkeypatch):
+    seen = {}
+
+    async def upload(username, owner, metadata, timestamp=None, idempotency_key=None):
+        seen.update(username=username, idempotency_key=idempotency_key)
+        return {"success": True, "id": "tx_new", "timestamp": timestamp}
+
+    monkeypatch.setattr(irys_service, "upload_username_to_irys", upload)
+    entry = asyncio.run(irys_service.outbox.enqueue("first_try", OWNER, {}))._replace(attempts=1)
+    assert asyncio.run(irys_service.deliver_registration(entry))["success"] is True
+    assert seen == {"username": "first_try", "idempotency_key": entry.ticket}
+    assert irys_service.registry.get("first_try").id == "tx_new"
+
+
+def test_batch_check_honours_reservations(irys):
+    irys.register("batch_taken")
+    asyncio.run(irys_service.reservations.reserve("batch_held", OWNER))
+    try:
+        response = call("POST", "/api/username/check/batch", json={"usernames": ["batch_taken", "batch_held", "batch_free", "?"]})
+    finally:
+        asyncio.run(irys_service.reservations.release("batch_held"))
+
+    assert [result["available"] for result in response.json()["results"]] == [False, False, True, None]
+
+
+def test_upstream_outage_serves_stale_positives_only(irys):
+    irys.register("stale_taken")
+    assert call("GET", "/api/resolve/stale_taken").status_code == 200
+    assert call("GET", "/api/resolve/stale_free").status_code == 404
+    # Expire both cache entries, then lose the upstream
+    for name in ("stale_taken", "stale_free"):
+        value, _ = irys_service.username_cache._entries[name]
+        irys_service.username_cache._entries[name] = (value, 0)
+    irys.down = True
+
+    assert call("GET", "/api/resolve/stale_taken").json()["owner"] == OWNER
+    response = call("GET", "/api/username/check/stale_free")
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+def test_resolve(irys):
+    irys.register("alice")
+    response = call("GET", "/api/resolve/Alice")
+    assert response.status_code == 200
+    assert response.json()["owner"] == OWNER
+    # The transaction id is the ETag
+    assert call("GET", "/api/resolve/alice", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    assert call("GET", "/api/resolve/nobody").status_code == 404
+    assert call("GET", "/api/resolve/no!").status_code == 400
+
+
+def test_check_availability(irys):
+    irys.register("taken")
+    assert call("GET", "/api/username/check/taken").json()["available"] is False
+    assert call("GET", "/api/username/check/free").json()["available"] is True
+    assert call("GET", "/api/username/check/x").status_code == 400
+
+
+def test_ticket_must_be_exactly_32_hex_characters(irys):
+    assert call("GET", "/api/registration/" + "a" * 32).status_code == 404
+    assert call("GET", "/api/registration/" + "a" * 32 + "%0A").status_code == 400
+    assert call("GET", "/api/registration/" + "A" * 32).status_code == 400
+
+
+def test_search_reports_incomplete_until_the_index_is_built(irys, monkeypatch):
+    monkeypatch.setattr(irys_service.registry, "index", None)
+    response = call("GET", "/api/search/similar", params={"name": "alice"})
+    assert response.json() == {"name": "alice", "matches": [], "count": 0, "complete": False}
+
+    asyncio.run(irys_service._build_index())
+    asyncio.run(irys_service.registry.apply([UsernameRecord("tx_alicea", "alicea", OWNER, 1)]))
+    assert call("GET", "/api/search/similar", params={"name": "alice"}).json()["matches"] == [
+        {"username": "alicea", "distance": 1}
+    ]
+    assert call("GET", "/api/search", params={"prefix": "ALI"}).json()["usernames"] == ["alicea"]
+
+
+def test_local_cursors_must_be_non_negative_offsets(irys):
+    for cursor in ("local:-2", "local:abc", "local:", "local:1 "):
+        assert call("GET", "/api/usernames", params={"after": cursor}).status_code == 400
+    assert call("GET", "/api/usernames", params={"after": "local:0"}).status_code == 200
+
+
+def test_stream_reports_an_error_instead_of_sending_a_local_cursor_upstream(irys, monkeypatch):
+    monkeypatch.setattr(irys_service.registry, "is_current", lambda: False)
+    queries = irys.queries
+    lines = call("GET", "/api/usernames", params={"after": "local:5", "format": "ndjson"}).text.splitlines()
+    assert lines == [json.dumps({"error": "Failed to fetch usernames"})]
+    assert irys.queries == queries
@@ -0,0 +1,51 @@
+"""Known-answer test for the native uploader's ANS-104 data items.
+
+The expected id and bytes were produced with PyArweave 0.6.0 (ar.bundle.DataItem with the Secp256k1
+signature type), an implementation independent of server.py's deep hash, tag encoding and item layout.
+PyArweave has no secp256k1 signer, so the signature over its deep hash was made with eth_account's
+personal-message signing, which is what the Irys SDK's EthereumSigner does.
+"""
+
+from server import DataItemSigner, deep_hash, encode_tags
+
+PRIVATE_KEY = "4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318"
+ADDRESS = "0x2c7536E3605D9C16a7a3D7b1898e529396a65c23"
+TAGS = [("Content-Type", "application/json"), ("App-Name", "IrysUsername"), ("Username", "alice")]
+ANCHOR = bytes(range(32))
+DATA = b'{"username":"alice"}'
+
+EXPECTED_ID = "lztBqR1j0o2IMMaB1BReZ-rmIxjlAovzIki072SBVBE"
+EXPECTED_ITEM = bytes.fromhex(
+    "03000611dac924b4eea32d54aa532d97ac8bd95542d4afa17d0529046e9d5a9b38d208054b06aa8c6f68e0fa0655e6d2"
+    "d3d2dcc6ece091948e5ea8595b0288532d901b044e3b81af9c2234cad09d679ce6035ed1392347ce64ce405f5dcd3622"
+    "8a25de6e47fd35c4215d1edf53e6f83de344615ce719bdb0fd878f6ed76f06dd277956de000100010203040506070809"
+    "0a0b0c0d0e0f101112131415161718191a1b1c1d1e1f030000000000000045000000000000000618436f6e74656e742d"
+    "54797065206170706c69636174696f6e2f6a736f6e104170702d4e616d651849727973557365726e616d651055736572"
+    "6e616d650a616c696365007b22757365726e616d65223a22616c696365227d"
+)
+
+
+def test_signed_item_matches_reference_bytes():
+    signer = DataItemSigner(PRIVATE_KEY)
+    item_id, item = signer.sign(DATA, TAGS, ANCHOR)
+    assert signer.address == ADDRESS
+    assert item == EXPECTED_ITEM
+    assert item_id == EXPECTED_ID
+
+
+def test_signing_is_deterministic_for_a_fixed_anchor():
+    signer = DataItemSigner(PRIVATE_KEY)
+    assert signer.sign(DATA, TAGS, ANCHOR) == signer.sign(DATA, TAGS, ANCHOR)
+    assert signer.sign(DATA, TAGS)[0] != signer.sign(DATA, TAGS)[0]
+
+
+def test_encode_tags():
+    assert encode_tags([]) == b""
+    # Avro array: zigzag count 1, then zigzag-length-prefixed name and value, then the end-of-array marker
+    assert encode_tags([("a", "bc")]) == b"\x02\x02a\x04bc\x00"
+
+
+def test_deep_hash_distinguishes_lists_from_blobs():
+    assert len(deep_hash(b"")) == 48
+    assert deep_hash([b"a"]) != deep_hash(b"a")
+    assert deep_hash([b"a", b"b"]) != deep_hash([b"ab"])
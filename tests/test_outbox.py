@@ -0,0 +1,232 @@
+import asyncio
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import outbox
+from outbox import RegistrationOutbox
+from state import MemoryStateBackend, ReservationTable
+
+OWNER = "0x" + "ab" * 20
+
+
+@pytest.fixture
+def box(tmp_path, clock, monkeypatch):
+    # Take the top of the jitter range so that backoff delays are exact
+    monkeypatch.setattr(outbox, "random", SimpleNamespace(uniform=lambda low, high: high))
+    registration_outbox = RegistrationOutbox(
+        str(tmp_path / "outbox.db"), workers=1, max_attempts=3, retry_base=1.0, retry_max=4.0,
+        lease=30.0, poll_interval=0.01, retention=3600.0, reservations=ReservationTable(60.0, MemoryStateBackend()),
+    )
+    yield registration_outbox
+    run(registration_outbox.close())
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def process(box, entry, result):
+    async def deliver(_entry):
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    box._deliver = deliver
+    run(box._process(entry))
+
+
+def test_enqueue_rejects_a_second_open_registration(box):
+    entry = run(box.enqueue("alice", OWNER, {"bio": "hi"}))
+    assert entry is not None
+    assert run(box.enqueue("alice", OWNER, {})) is None
+    assert run(box.holder("alice")) == entry.ticket
+    assert run(box.get(entry.ticket)).metadata == {"bio": "hi"}
+    assert box.conflicts == 1
+
+
+def test_claim_takes_each_entry_once(box):
+    first = run(box.enqueue("alice", OWNER, {}))
+    second = run(box.enqueue("bob", OWNER, {}))
+
+    claimed = [run(box.claim()), run(box.claim())]
+    assert {entry.ticket for entry in claimed} == {first.ticket, second.ticket}
+    assert all(entry.status == "uploading" and entry.attempts == 1 for entry in claimed)
+    assert run(box.claim()) is None
+
+
+def test_expired_lease_is_claimed_again(box, clock):
+    entry = run(box.enqueue("alice", OWNER, {}))
+    assert run(box.claim()).ticket == entry.ticket
+
+    clock.advance(29)
+    assert run(box.claim()) is None
+    clock.advance(1)
+    reclaimed = run(box.claim())
+    assert reclaimed.ticket == entry.ticket
+    assert reclaimed.attempts == 2
+    # Still open while it is being uploaded, so the name stays held
+    assert run(box.holder("alice")) == entry.ticket
+
+
+def test_failed_delivery_backs_off_exponentially(box, clock):
+    entry = run(box.enqueue("alice", OWNER, {}))
+
+    process(box, run(box.claim()), {"success": False, "error": "bundler busy"})
+    assert run(box.get(entry.ticket)).status == "pending"
+    assert run(box.get(entry.ticket)).error == "bundler busy"
+    assert run(box.claim()) is None
+    clock.advance(1)
+
+    process(box, run(box.claim()), RuntimeError("connection reset"))
+    assert run(box.get(entry.ticket)).error == "connection reset"
+    clock.advance(1.9)
+    assert run(box.claim()) is None
+    clock.advance(0.1)
+    assert run(box.claim()).attempts == 3
+    assert box.retried == 2
+
+
+def test_retry_delay_is_capped(box):
+    assert box.retry_delay(1) == 1.0
+    assert box.retry_delay(3) == 4.0
+    assert box.retry_delay(10) == 4.0
+
+
+def test_gives_up_after_max_attempts(box, clock):
+    entry = run(box.enqueue("alice", OWNER, {}))
+    for _ in range(3):
+        process(box, run(box.claim()), {"success": False, "error": "timeout"})
+        clock.advance(10)
+
+    failed = run(box.get(entry.ticket))
+    assert failed.status == "failed"
+    assert failed.attempts == 3
+    assert run(box.claim()) is None
+    assert run(box.holder("alice")) is None
+    assert box.failed == 1
+
+
+def test_permanent_failure_is_not_retried(box):
+    entry = run(box.enqueue("alice", OWNER, {}))
+    process(box, run(box.claim()), {"success": False, "retry": False, "error": "Username is already taken"})
+
+    failed = run(box.get(entry.ticket))
+    assert failed.status == "failed"
+    assert failed.attempts == 1
+    assert failed.error == "Username is already taken"
+    # The name can be registered again
+    assert run(box.enqueue("alice", OWNER, {})) is not None
+
+
+def test_confirmed_delivery_records_the_transaction(box):
+    entry = run(box.enqueue("alice", OWNER, {}))
+    process(box, run(box.claim()), {"success": True, "id": "tx1"})
+
+    confirmed = run(box.get(entry.ticket))
+    assert confirmed.status == "confirmed"
+    assert confirmed.tx_id == "tx1"
+    assert run(box.holder("alice")) is None
+    assert run(box.stats())["confirmed"] == 1
+
+
+def test_cancelled_delivery_is_handed_back(box, clock):
+    entry = run(box.enqueue("alice", OWNER, {}))
+    with pytest.raises(asyncio.CancelledError):
+        process(box, run(box.claim()), asyncio.CancelledError())
+
+    assert run(box.get(entry.ticket)).status == "pending"
+    # No need to wait for the lease
+    assert run(box.claim()).ticket == entry.ticket
+
+
+def test_reservation_is_held_until_the_entry_settles(box, clock):
+    reservations = box.reservations
+    assert run(reservations.reserve("alice", OWNER))
+    entry = run(box.enqueue("alice", OWNER, {}))
+
+    process(box, run(box.claim()), {"success": False, "error": "bundler busy"})
+    assert run(reservations.holder("alice")) == OWNER
+    assert not run(reservations.reserve("alice", "0x" + "cd" * 20))
+
+    clock.advance(1)
+    process(box, run(box.claim()), {"success": True, "id": "tx1"})
+    assert run(box.get(entry.ticket)).status == "confirmed"
+    assert run(reservations.holder("alice")) is None
+    assert reservations.stats()["pending"] == 0
+
+
+def test_name_reserved_by_another_owner_is_not_uploaded(box):
+    other = "0x" + "cd" * 20
+    entry = run(box.enqueue("alice", OWNER, {}))
+    # The reservation lapsed, and another node has reserved the name since
+    assert run(box.reservations.reserve("alice", other))
+
+    process(box, run(box.claim()), AssertionError("must not be delivered"))
+    retried = run(box.get(entry.ticket))
+    assert retried.status == "pending"
+    assert retried.error == "Username registration in progress elsewhere"
+
+    # Giving up does not drop the other owner's reservation
+    process(box, retried._replace(attempts=3), AssertionError("must not be delivered"))
+    assert run(box.get(entry.ticket)).status == "failed"
+    assert run(box.reservations.holder("alice")) == other
+
+
+def test_workers_drain_the_outbox(tmp_path):
+    delivered = []
+
+    async def deliver(entry):
+        delivered.append(entry.username)
+        return {"success": True, "id": f"tx_{entry.username}"}
+
+    async def main():
+        registration_outbox = RegistrationOutbox(
+            str(tmp_path / "outbox.db"), workers=2, max_attempts=3, retry_base=1.0, retry_max=4.0,
+            lease=30.0, poll_interval=0.01, retention=3600.0,
+        )
+        await registration_outbox.start(deliver)
+        for name in ("alice", "bob", "carol"):
+            await registration_outbox.enqueue(name, OWNER, {})
+        for _ in range(100):
+            if registration_outbox.confirmed == 3:
+                break
+            await asyncio.sleep(0.01)
+        await registration_outbox.close()
+
+    run(main())
+    assert sorted(delivered) == ["alice", "bob", "carol"]
+
+
+def test_worker_survives_a_failing_claim(tmp_path, monkeypatch):
+    registration_outbox = RegistrationOutbox(
+        str(tmp_path / "outbox.db"), workers=1, max_attempts=3, retry_base=1.0, retry_max=4.0,
+        lease=30.0, poll_interval=0.01, retention=3600.0,
+    )
+    claim = registration_outbox._claim
+    failures = []
+
+    def locked():
+        if not failures:
+            failures.append(True)
+            raise sqlite3.OperationalError("database is locked")
+        return claim()
+
+    monkeypatch.setattr(registration_outbox, "_claim", locked)
+
+    async def deliver(entry):
+        return {"success": True, "id": "tx1"}
+
+    async def main():
+        await registration_outbox.start(deliver)
+        await registration_outbox.enqueue("alice", OWNER, {})
+        for _ in range(100):
+            if registration_outbox.confirmed:
+                break
+            await asyncio.sleep(0.01)
+        await registration_outbox.close()
+
+    run(main())
+    assert failures == [True]
+    assert registration_outbox.confirmed == 1
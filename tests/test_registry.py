@@ -0,0 +1,246 @@
+import asyncio
+import random
+import sqlite3
+
+import pytest
+
+from registry import RegistryAggregates, RegistrySnapshot, UsernameIndex, UsernameRecord, UsernameRegistry, edit_distance
+
+ALICE = "0x" + "a1" * 20
+BOB = "0x" + "b2" * 20
+
+
+def record(username, owner=ALICE, timestamp=1_700_000_000_000, tx_id=None):
+    return UsernameRecord(tx_id or f"tx_{username}", username, owner, timestamp)
+
+
+def open_registry(tmp_path, db="registry.db", snapshot="registry.snapshot"):
+    registry = UsernameRegistry(
+        str(tmp_path / db), str(tmp_path / snapshot), sync_interval=10.0,
+        bloom_capacity=1000, bloom_error_rate=0.01, newest_size=3,
+    )
+    registry.open()
+    return registry
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def write_snapshot(registry):
+    # As IrysService.save_snapshot does, so that the snapshot's watermark covers the registry's own writes
+    run(registry.refresh())
+    return UsernameRegistry.write_snapshot(registry.snapshot_path, registry.snapshot_state())
+
+
+def test_snapshot_round_trip(tmp_path):
+    registry = open_registry(tmp_path)
+    run(registry.apply([record("alice"), record("bob", BOB), record("carol")], cursor="c3"))
+    assert write_snapshot(registry) == 3
+    registry.close()
+
+    reopened = open_registry(tmp_path)
+    assert reopened.snapshot is not None
+    assert reopened.snapshot.count == 3
+    assert len(reopened) == 3
+    assert reopened.cursor == "c3"
+    assert reopened.get("bob") == record("bob", BOB)
+    assert reopened.get("dave") is None
+    assert sorted(reopened.names_for_owner(ALICE)) == ["alice", "carol"]
+    assert [r.username for r in reopened.page(0, 10)] == ["alice", "bob", "carol"]
+    reopened.close()
+
+
+def test_rows_after_the_snapshot_are_replayed(tmp_path):
+    registry = open_registry(tmp_path)
+    run(registry.apply([record("alice")], cursor="c1"))
+    write_snapshot(registry)
+    # An earlier registration replaces the mapped record; a new name lands after the snapshot
+    run(registry.apply([record("alice", BOB, timestamp=1), record("bob")], cursor="c3"))
+    registry.close()
+
+    reopened = open_registry(tmp_path)
+    assert len(reopened) == 2
+    assert reopened.get("alice").owner == BOB
+    assert reopened.names_for_owner(ALICE) == ["bob"]
+    assert reopened.cursor == "c3"
+    reopened.close()
+
+
+def test_long_strings_survive_the_snapshot(tmp_path):
+    registry = open_registry(tmp_path)
+    run(registry.apply([record("alice", tx_id="x" * 300)]))
+    write_snapshot(registry)
+    registry.close()
+
+    reopened = open_registry(tmp_path)
+    assert reopened.snapshot is not None
+    assert reopened.get("alice").id == "x" * 300
+    reopened.close()
+
+    with pytest.raises(ValueError):
+        RegistrySnapshot.write(
+            str(tmp_path / "too-long.snapshot"), [record("bob", tx_id="x" * (RegistrySnapshot.MAX_STRING + 1))],
+            None, registry.bloom, 1, registry.registry_id,
+        )
+
+
+def test_snapshot_from_another_database_is_discarded(tmp_path):
+    other = open_registry(tmp_path, db="other.db")
+    run(other.apply([record("mallory")], cursor="c9"))
+    write_snapshot(other)
+    other.close()
+
+    registry = open_registry(tmp_path)
+    assert registry.snapshot is None
+    assert len(registry) == 0
+    assert registry.get("mallory") is None
+    assert registry.cursor is None
+    registry.close()
+
+
+def test_snapshot_ahead_of_its_database_is_discarded(tmp_path):
+    registry = open_registry(tmp_path)
+    run(registry.apply([record("alice"), record("bob")], cursor="c2"))
+    write_snapshot(registry)
+    registry.close()
+    with sqlite3.connect(str(tmp_path / "registry.db")) as db:
+        db.execute("DELETE FROM usernames")
+
+    reopened = open_registry(tmp_path)
+    assert reopened.snapshot is None
+    assert len(reopened) == 0
+    reopened.close()
+
+
+def test_refresh_reads_rows_written_by_another_worker(tmp_path):
+    leader = open_registry(tmp_path)
+    follower = open_registry(tmp_path)
+    run(leader.apply([record("alice")], cursor="c1"))
+    run(leader.mark_synced())
+
+    assert [r.username for r in run(follower.refresh())] == ["alice"]
+    assert follower.cursor == "c1"
+    assert follower.is_current()
+    assert run(follower.refresh()) == []
+    leader.close()
+    follower.close()
+
+
+def test_writes_wait_for_another_workers_lock_off_the_event_loop(tmp_path):
+    registry = open_registry(tmp_path)
+    other_worker = sqlite3.connect(str(tmp_path / "registry.db"), isolation_level=None)
+    other_worker.execute("BEGIN IMMEDIATE")
+
+    async def main():
+        write = asyncio.create_task(registry.apply([record("alice")], cursor="c1"))
+        ticks = 0
+        while not write.done() and ticks < 5:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        # Lookups see the record while its row waits for the lock
+        assert registry.get("alice") is not None
+        other_worker.execute("COMMIT")
+        await write
+        return ticks
+
+    assert run(main()) == 5
+    other_worker.close()
+    registry.close()
+    with sqlite3.connect(str(tmp_path / "registry.db")) as db:
+        assert db.execute("SELECT username FROM usernames").fetchall() == [("alice",)]
+
+
+def test_edit_distance():
+    assert edit_distance("alice", "alice", 2) == 0
+    assert edit_distance("alice", "alcie", 2) == 2
+    assert edit_distance("alice", "alice99", 2) == 2
+    assert edit_distance("alice", "bob", 2) == 3
+
+
+def test_similar_matches_a_brute_force_scan():
+    rng = random.Random(7)
+    names = {"".join(rng.choice("abc_1") for _ in range(rng.randint(3, 8))) for _ in range(400)}
+    index = UsernameIndex()
+    for name in names:
+        index.add(name)
+
+    for query in ["abc", "a_b1", "cccc", "ab1ca", "bb", sorted(names)[0]]:
+        for max_distance in (0, 1, 2):
+            # The query itself is not a suggestion
+            expected = sorted(
+                (name, distance) for name in names
+                if 0 < (distance := edit_distance(query, name, max_distance)) <= max_distance
+            )
+            found = index.similar(query, max_distance, limit=len(names))
+            assert sorted(found) == expected
+            # Closest first, then alphabetically; a limit keeps the head of that order
+            closest = sorted(expected, key=lambda match: (match[1], match[0]))
+            assert found == closest
+            assert index.similar(query, max_distance, limit=5) == closest[:5]
+
+
+def test_index_built_off_the_event_loop_catches_up(tmp_path):
+    registry = open_registry(tmp_path)
+    run(registry.apply([record("alice"), record("alicia")]))
+    write_snapshot(registry)
+    registry.close()
+
+    reopened = open_registry(tmp_path)
+    run(reopened.apply([record("alina")]))
+    source = reopened.index_source()
+    # Registered while the build runs
+    run(reopened.apply([record("alise")]))
+    index = UsernameRegistry.build_index(source)
+    assert reopened.index is None
+    reopened.install_index(index)
+
+    assert reopened.index.prefix("ali", 10) == ["alice", "alicia", "alina", "alise"]
+    run(reopened.apply([record("alix")]))
+    assert [name for name, _ in reopened.index.similar("alic", 1, 10)] == ["alice", "alix"]
+    reopened.close()
+
+
+def test_prefix_search():
+    index = UsernameIndex()
+    for name in ["bob", "alice", "alex", "al"]:
+        index.add(name)
+    assert index.prefix("al", 10) == ["al", "alex", "alice"]
+    assert index.prefix("al", 2) == ["al", "alex"]
+    assert index.prefix("z", 10) == []
+
+
+def test_aggregates_follow_replacements():
+    aggregates = RegistryAggregates(newest_size=2)
+    records = [record(f"user{i}", ALICE if i % 2 else BOB, timestamp=i * 86_400_000) for i in range(5)]
+    for item in records:
+        aggregates.add(item)
+    assert [r.username for r in aggregates.newest()] == ["user4", "user3"]
+    assert aggregates.top_owners(1) == [(BOB, 3)]
+
+    # user4 turns out to have been registered first, by someone else
+    aggregates.remove(records[4])
+    aggregates.add(record("user4", ALICE, timestamp=0))
+    assert not aggregates.stale
+    assert [r.username for r in aggregates.newest()] == ["user3", "user2"]
+    assert aggregates.top_owners(2) == [(ALICE, 3), (BOB, 2)]
+    assert aggregates.total == 5
+
+
+def test_aggregates_go_stale_once_replacements_use_up_the_spares():
+    aggregates = RegistryAggregates(newest_size=1)
+    records = [record(f"user{i}", timestamp=i * 1000) for i in range(5)]
+    for item in records:
+        aggregates.add(item)
+
+    # Only user4 and user3 are tracked; replacing both with earlier registrations empties the list
+    for item in (records[4], records[3]):
+        aggregates.remove(item)
+        aggregates.add(record(item.username, BOB, timestamp=1))
+    assert aggregates.stale
+    assert aggregates.newest() == []
+    assert aggregates.total == 5
+    assert aggregates.top_owners(2) == [(ALICE, 3), (BOB, 2)]
+
+    with pytest.raises(ValueError):
+        RegistryAggregates(newest_size=0)
@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceededError, RateLimiter, SingleFlight, TokenBucket,
+    deadline_timeout, request_deadline,
+)
+
+
+def test_circuit_breaker_opens_probes_and_closes(clock):
+    breaker = CircuitBreaker("graphql", failure_threshold=2, reset_timeout=10.0)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.trips == 1
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.retry_after() == 11
+
+    clock.advance(10)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+    assert breaker.rejected == 2
+
+
+def test_failed_probe_reopens_the_circuit(clock):
+    breaker = CircuitBreaker("graphql", failure_threshold=5, reset_timeout=10.0)
+    breaker.state, breaker.opened_at = "open", clock.now
+    clock.advance(10)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_cancelled_probe_lets_the_next_one_through(clock):
+    breaker = CircuitBreaker("graphql", failure_threshold=1, reset_timeout=10.0)
+    breaker.record_failure()
+    clock.advance(10)
+    breaker.before_call()
+    breaker.cancel_call()
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+
+def test_deadline_timeout(clock):
+    assert deadline_timeout(10.0) == 10.0
+    token = request_deadline.set(clock.now + 2.0)
+    try:
+        assert deadline_timeout(10.0) == 2.0
+        clock.advance(2.0)
+        with pytest.raises(DeadlineExceededError):
+            deadline_timeout(10.0)
+    finally:
+        request_deadline.reset(token)
+
+
+def test_single_flight_does_not_pass_the_callers_deadline_on():
+    seen = []
+
+    async def lookup():
+        seen.append(request_deadline.get())
+        return None
+
+    async def main():
+        request_deadline.set(asyncio.get_running_loop().time() + 60)
+        await SingleFlight().do("alice", lookup)
+
+    asyncio.run(main())
+    assert seen == [None]
+
+
+def test_single_flight_shares_one_call():
+    calls = 0
+
+    async def lookup():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "record"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*[flight.do("alice", lookup) for _ in range(5)])
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert results == ["record"] * 5
+    assert calls == 1
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "deduplicated": 4}
+
+
+def test_token_bucket_spends_and_refills(clock):
+    bucket = TokenBucket(rate=2.0, burst=3.0)
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() == pytest.approx(0.5)
+
+    clock.advance(0.5)
+    assert bucket.take() == 0.0
+    clock.advance(60)
+    # Refills stop at the burst size
+    assert [bucket.take() for _ in range(4)][-1] == pytest.approx(0.5)
+
+
+def test_token_bucket_weighs_cost_and_refunds(clock):
+    bucket = TokenBucket(rate=1.0, burst=5.0)
+    assert bucket.take(5) == 0.0
+    assert bucket.take(2) == pytest.approx(2.0)
+    bucket.refund(2)
+    assert bucket.take(2) == 0.0
+    assert TokenBucket(rate=0.0, burst=0.0).take() == float("inf")
+
+
+def test_rate_limiter_separates_clients_and_refunds_global_rejections(clock):
+    limiter = RateLimiter("check", client_rate=1.0, client_burst=2.0, global_rate=1.0, global_burst=3.0, max_clients=10)
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("a") > 0
+    assert limiter.acquire("b") == 0.0
+    # The server as a whole is out of tokens; b is not charged for it
+    assert limiter.acquire("b") > 0
+    assert limiter._clients["b"].tokens == pytest.approx(1.0)
+    assert limiter.stats()["limited_client"] == 1
+    assert limiter.stats()["limited_global"] == 1
+
+
+def test_rate_limiter_forgets_the_least_recent_client(clock):
+    limiter = RateLimiter("check", client_rate=0.0, client_burst=1.0, global_rate=100.0, global_burst=100.0, max_clients=2)
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("b") == 0.0
+    assert limiter.acquire("c") == 0.0
+    # a was evicted, so it starts again with a full bucket
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("c") > 0